@@ -0,0 +1,272 @@
+# Install FontForge
+# Add FontForge bin directory to path.
+# Run: fontforge -script benchmark.py -o results.json
+#
+# Generates synthetic SVG icon sets, builds fonts from them with svg2webfont.py
+# and records the time spent in each stage of the build as JSON, so that the
+# results can be compared across commits. Runs offline, needs only FontForge.
+
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fontforge
+import svg2webfont
+
+# View boxes used for the generated icons, the offset one is how e.g. Material
+# Symbols are exported
+VIEWBOXES = {
+    'zero': (0, 0, 24, 24),
+    'offset': (0, -960, 960, 960),
+}
+
+# Per-glyph overrides picked at random for the configuration
+CONFIG_OVERRIDES = [
+    {'scale': 'over_em'},
+    {'scale': 'in_ascent'},
+    {'halign': 'left'},
+    {'halign': 'right'},
+    {'valign': 'baseline'},
+    {'valign': 'ascent_center'},
+    {'xmove': 50, 'ymove': -50},
+    {'minwidth': 'auto', 'maxwidth': 'auto'},
+]
+
+def parse_int_list(s:str):
+    return [int(item) for item in s.split(',') if item.strip() != '']
+
+def parse_float_list(s:str):
+    return [float(item) for item in s.split(',') if item.strip() != '']
+
+def format_number(n:float):
+    return ('%.2f' % (n,)).rstrip('0').rstrip('.')
+
+def generate_path(rnd:random.Random, viewbox:tuple, segments:int):
+    # Closed path of cubic curves around the center of the view box with a random radius
+    (min_x, min_y, width, height) = viewbox
+    cx = min_x + width / 2.0
+    cy = min_y + height / 2.0
+    max_r = min(width, height) / 2.0
+
+    def point(angle:float):
+        r = max_r * rnd.uniform(0.3, 0.95)
+        return (cx + r * math.cos(angle), cy + r * math.sin(angle))
+
+    step = 2.0 * math.pi / segments
+    (x, y) = point(0.0)
+    d = ['M%s %s' % (format_number(x), format_number(y))]
+    for i in range(segments):
+        (x1, y1) = point((i + 0.33) * step)
+        (x2, y2) = point((i + 0.66) * step)
+        (x, y) = point((i + 1) * step) if i + 1 < segments else (x, y)
+        d.append('C%s %s %s %s %s %s' % tuple(format_number(n) for n in (x1, y1, x2, y2, x, y)))
+    d.append('Z')
+    return ''.join(d)
+
+def generate_corpus(dir:str, count:int, segments:int, origin:str, override_density:float, seed:int):
+    # Write count SVG files into dir and return the configuration with the overrides
+    rnd = random.Random(seed)
+    config = {}
+    for i in range(count):
+        name = 'icon_%05d' % (i,)
+        if origin == 'mixed':
+            viewbox = VIEWBOXES['zero' if i % 2 == 0 else 'offset']
+        else:
+            viewbox = VIEWBOXES[origin]
+        paths = ''.join('<path d="%s"/>' % (generate_path(rnd, viewbox, segments),) for _ in range(rnd.randint(1, 3)))
+        with open(os.path.join(dir, name + '.svg'), 'w') as file:
+            file.write('<svg xmlns="http://www.w3.org/2000/svg" viewBox="%s">%s</svg>' % (' '.join(str(n) for n in viewbox), paths))
+        if rnd.random() < override_density:
+            config[name] = dict(rnd.choice(CONFIG_OVERRIDES))
+    return config
+
+# Icons with diagonal strokes added to the verified icon sets, autoHint()
+# gives them diagonal stem hints the TrueType instructions are built from
+DIAGONAL_ICONS = {
+    'verify_check': 'M4 12l2-2 4 4 8-8 2 2-10 10z',
+    'verify_arrow': 'M5 17L15 7H8V5h11v11h-2V9L7 19z',
+}
+
+def get_git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'],
+                              cwd=os.path.dirname(os.path.abspath(__file__)),
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def build_font_tables(src_dir:str, font_file:str, config:dict, **kwargs):
+    # Build only the TrueType font file and return its tables by tag, a
+    # sharded build is read from the file of the default shard
+    values = {'mode': args.mode, 'hinting': args.hinting}
+    values.update(kwargs)
+    settings = svg2webfont.make_settings(
+        srcdir=src_dir,
+        cssfile='',
+        woff1file='',
+        woff2file='',
+        htmlfile='',
+        fontfile=font_file,
+        **values)
+    svg2webfont.build_font(settings, config)
+    if settings.shard != 'none':
+        font_file = svg2webfont.get_shard_file_path(font_file, svg2webfont.DEFAULT_SHARD)
+    with open(font_file, 'rb') as file:
+        return {tag.decode('latin-1'): data for (tag, _, data) in svg2webfont.read_sfnt_tables(file.read())[1]}
+
+def verify_builds(work_dir:str, src_dir:str, config:dict):
+    # Build the font cold and serially, then again fully from the glyph cache,
+    # with 4 jobs and as a single shard, and return the tables differing from
+    # the cold build. The icon set is copied and extended with the diagonal
+    # icons. Sharding requires class mode, so the shard is compared with a
+    # cold build in class mode.
+    verify_dir = os.path.join(work_dir, 'verify')
+    cache_dir = os.path.join(verify_dir, 'cache')
+    os.makedirs(verify_dir)
+
+    verify_src_dir = os.path.join(verify_dir, 'src')
+    shutil.copytree(src_dir, verify_src_dir)
+    for (name, d) in DIAGONAL_ICONS.items():
+        with open(os.path.join(verify_src_dir, name + '.svg'), 'w') as file:
+            file.write('<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 24 24"><path d="%s"/></svg>' % (d,))
+    src_dir = verify_src_dir
+
+    cold = build_font_tables(src_dir, os.path.join(verify_dir, 'cold.ttf'), config, cachedir=cache_dir, jobs=1)
+    builds = {
+        'cached': build_font_tables(src_dir, os.path.join(verify_dir, 'cached.ttf'), config, cachedir=cache_dir, jobs=1),
+        'jobs': build_font_tables(src_dir, os.path.join(verify_dir, 'jobs.ttf'), config, no_cache=True, jobs=4),
+    }
+    differing = {name: sorted(tag for tag in set(cold) | set(tables) if cold.get(tag) != tables.get(tag))
+                 for (name, tables) in builds.items()}
+
+    if args.mode != 'class':
+        cold = build_font_tables(src_dir, os.path.join(verify_dir, 'cold-class.ttf'), config, no_cache=True, jobs=1, mode='class')
+    sharded = build_font_tables(src_dir, os.path.join(verify_dir, 'sharded.ttf'), config, no_cache=True, jobs=1, mode='class', shard='tag')
+    differing['sharded'] = sorted(tag for tag in set(cold) | set(sharded) if cold.get(tag) != sharded.get(tag))
+
+    return differing
+
+def run_benchmark(work_dir:str, count:int, segments:int, origin:str, override_density:float, seed:int):
+    src_dir = os.path.join(work_dir, 'src')
+    dist_dir = os.path.join(work_dir, 'dist')
+    os.makedirs(src_dir)
+    os.makedirs(dist_dir)
+
+    config = generate_corpus(src_dir, count, segments, origin, override_density, seed)
+
+    settings = svg2webfont.make_settings(
+        srcdir=src_dir,
+        cssfile=os.path.join(dist_dir, 'font.css'),
+        woff1file=os.path.join(dist_dir, 'font.woff'),
+        woff2file=os.path.join(dist_dir, 'font.woff2'),
+        htmlfile=os.path.join(dist_dir, 'preview.html'),
+        mode=args.mode,
+        hinting=args.hinting,
+        jobs=args.jobs,
+        no_cache=True)
+
+    svg2webfont.profiler = svg2webfont.Profiler()
+    start_time = time.perf_counter()
+    start_cpu_time = time.process_time()
+    svg2webfont.build_font(settings, config)
+    wall_time = time.perf_counter() - start_time
+    cpu_time = time.process_time() - start_cpu_time
+    stages = {stage: totals['wall'] for (stage, totals) in svg2webfont.profiler.get_stage_totals().items()}
+    svg2webfont.profiler = None
+
+    result = {
+        'icons': count,
+        'segments': segments,
+        'origin': origin,
+        'override_density': override_density,
+        'overrides': len(config),
+        'wall_time': wall_time,
+        'cpu_time': cpu_time,
+        'stages': stages,
+        'woff_size': os.path.getsize(settings.woff1file),
+        'woff2_size': os.path.getsize(settings.woff2file),
+    }
+
+    if args.verify:
+        result['differing_tables'] = verify_builds(work_dir, src_dir, config)
+
+    return result
+
+parser = argparse.ArgumentParser()
+parser.add_argument('-n', '--counts', help='comma separated numbers of icons to generate, default: \'100,1000\'', default='100,1000', type=str)
+parser.add_argument('-s', '--segments', help='comma separated numbers of curve segments per path, default: \'8,64\'', default='8,64', type=str)
+parser.add_argument('-vo', '--origins', help='comma separated view box origins: \'zero\', \'offset\' or \'mixed\', default: \'zero,offset\'', default='zero,offset', type=str)
+parser.add_argument('-od', '--overridedensity', help='comma separated fractions of icons with overrides in the configuration, default: \'0.1\'', default='0.1', type=str)
+parser.add_argument('-m', '--mode', choices=['class', 'ligature', 'both'], default='ligature', help='font mode to build, default: \'ligature\'')
+parser.add_argument('-hi', '--hinting', choices=['auto', 'none'], default='auto', help='hinting of the glyphs, default: \'auto\'')
+parser.add_argument('-j', '--jobs', help='number of worker processes of the builds, default 1', default=1, type=int)
+parser.add_argument('-r', '--seed', help='seed of the random generator, default 1', default=1, type=int)
+parser.add_argument('-o', '--outfile', help='path to the JSON results file, printed if not specified', default='', type=str)
+parser.add_argument('-vf', '--verify', help='also check that a build fully restored from the glyph cache and a build with 4 jobs give the same font tables as a cold serial build', action='store_true')
+parser.add_argument('-k', '--keep', help='keep the generated icons and fonts in the temporary directory', action='store_true')
+args = parser.parse_args()
+
+origins = [origin.strip() for origin in args.origins.split(',') if origin.strip() != '']
+for origin in origins:
+    if origin not in ('zero', 'offset', 'mixed'):
+        print('bad view box origin: %s' % (origin,))
+        sys.exit(-1)
+
+override_densities = parse_float_list(args.overridedensity)
+for override_density in override_densities:
+    if override_density < 0 or override_density > 1:
+        print('bad override density: %s' % (format_number(override_density),))
+        sys.exit(-1)
+
+results = []
+verify_failed = False
+for count in parse_int_list(args.counts):
+    for segments in parse_int_list(args.segments):
+        for origin in origins:
+            for override_density in override_densities:
+                work_dir = tempfile.mkdtemp(prefix='svg2webfont-bench-')
+                try:
+                    result = run_benchmark(work_dir, count, segments, origin, override_density, args.seed)
+                finally:
+                    if args.keep:
+                        print('kept %s' % (work_dir,), file=sys.stderr)
+                    else:
+                        shutil.rmtree(work_dir, ignore_errors=True)
+                print('%d icons, %d segments, %s origin, %s override density: %.2f s' % (
+                    count, segments, origin, format_number(override_density), result['wall_time']), file=sys.stderr)
+                for (build, tags) in result.get('differing_tables', {}).items():
+                    if len(tags) > 0:
+                        print('%s build differs from the cold serial build in tables: %s' % (build, ', '.join(tags)), file=sys.stderr)
+                        verify_failed = True
+                results.append(result)
+
+report = json.dumps({
+    'commit': get_git_commit(),
+    'fontforge': fontforge.version(),
+    'python': platform.python_version(),
+    'platform': platform.platform(),
+    'jobs': args.jobs,
+    'mode': args.mode,
+    'hinting': args.hinting,
+    'seed': args.seed,
+    'results': results,
+}, indent=2)
+
+if args.outfile != '':
+    with open(args.outfile, 'w') as file:
+        file.write(report + '\n')
+else:
+    print(report)
+
+if verify_failed:
+    sys.exit(-1)
@@ -1,17 +1,27 @@
 # Install FontForge
 # Add FontForge bin directory to path.
 # Run: fontforge -script fontinfo.py -f path/to/font.woff2
+# Or:  fontforge -script fontinfo.py -f dist/fonts/*.woff2 -c EA01,EA02 -n settings -o json
+#
+# Prints the code points, names, advance widths, point counts and ligatures
+# of the glyphs of one or more fonts as text, JSON or CSV. Each font is
+# opened once and indexed by code point and name for all queries.
 
 import fontforge
 import argparse
+import bisect
+import csv
+import json
+import sys
 
 # Parse input arguments
 parser = argparse.ArgumentParser()
-parser.add_argument("-f", "--file", help="font file path", type=str, required=True)
+parser.add_argument("-f", "--file", help="one or more font file paths", type=str, nargs="+", required=True)
 parser.add_argument("-c", "--charcodes", help="a comma separated list of hex char codes for which to print info", type=str)
 parser.add_argument("-s", "--start", help="hex char code from which to start info printing", type=str)
 parser.add_argument("-e", "--end", help="hex char code at which to end info printing", type=str)
-parser.add_argument("-n", "--name", help="name of the character to be printed", type=str)
+parser.add_argument("-n", "--name", help="a comma separated list of names of the characters to be printed", type=str)
+parser.add_argument("-o", "--output", choices=["text", "json", "csv"], default="text", help="output format, default: 'text'")
 args = parser.parse_args()
 
 if args.charcodes != None and args.charcodes != "":
@@ -29,20 +39,149 @@ if args.end != None and args.end != "":
 else:
     end = None
 
-if charcodes == None and start == None and end == None and (args.name == None or args.name == ""):
+if args.name != None and args.name != "":
+    names = [name.strip() for name in args.name.split(",") if name.strip() != ""]
+else:
+    names = None
+
+if charcodes == None and start == None and end == None and names == None:
     print_all = True
 else:
     print_all = False
 
-font = fontforge.open(args.file)
-print("Font em: %s, ascent=%s, descent=%s," % (font.em, font.ascent, font.descent))
+class FontIndex:
+    # Glyphs of a font by code point and by name, built in one pass over the glyphs
+    def __init__(self, font):
+        self.glyphs = list(font.glyphs())
+        self.by_code = {}
+        self.by_name = {}
+        for glyph in self.glyphs:
+            self.by_name[glyph.glyphname] = glyph
+            for code in get_glyph_codes(glyph):
+                self.by_code.setdefault(code, glyph)
+        self.codes = sorted(self.by_code)
+        self.ligatures = get_ligatures(font, self.glyphs)
+
+    def get_code_range(self, start:int, end:int):
+        # Code points from start to end inclusive, either can be None
+        first = bisect.bisect_left(self.codes, start) if start != None else 0
+        last = bisect.bisect_right(self.codes, end) if end != None else len(self.codes)
+        return self.codes[first:last]
+
+def get_glyph_codes(glyph):
+    # The code point of the glyph followed by the alternate ones
+    codes = []
+    if glyph.unicode != -1:
+        codes.append(glyph.unicode)
+    if glyph.altuni != None:
+        codes.extend(alt[0] for alt in glyph.altuni if alt[0] not in codes)
+    return codes
+
+def get_ligatures(font, glyphs:list):
+    # Ligature texts substituted with each glyph by the GSUB table, by glyph name
+    chars = {glyph.glyphname: chr(glyph.unicode) for glyph in glyphs if glyph.unicode != -1}
+    ligatures = {}
+    for glyph in glyphs:
+        for possub in glyph.getPosSub("*"):
+            if possub[1] != "Ligature":
+                continue
+            components = possub[2:]
+            if all(component in chars for component in components):
+                text = "".join(chars[component] for component in components)
+            else:
+                text = " ".join(components)
+            ligatures.setdefault(glyph.glyphname, []).append(text)
+    return ligatures
+
+def get_glyph_points(glyph):
+    return sum(len(contour) for contour in glyph.foreground)
+
+def get_glyph_row(file:str, index:FontIndex, glyph, code):
+    return {
+        "file": file,
+        "code": "%x" % (code,) if code != None else None,
+        "name": glyph.glyphname,
+        "width": glyph.width,
+        "points": get_glyph_points(glyph),
+        "bbox": list(glyph.boundingBox()),
+        "ligatures": index.ligatures.get(glyph.glyphname, []),
+    }
 
-for glyph in font.glyphs():
-    if print_all \
-        or (charcodes != None and glyph.unicode in charcodes) \
-        or (start != None and glyph.unicode >= start and (end == None or glyph.unicode <= end)) \
-        or (start == None and end != None and glyph.unicode <= end) \
-        or (args.name != None and args.name == glyph.glyphname):
-        print("Char code: %x (%d), name: %s, bbox: %s" % (glyph.unicode, glyph.unicode, glyph.glyphname, glyph.boundingBox()))
+def query_font(file:str, index:FontIndex):
+    # Rows of the glyphs matching the queries and the char codes and names not found
+    rows = []
+    missing_charcodes = []
+    missing_names = []
+
+    if print_all:
+        for glyph in index.glyphs:
+            codes = get_glyph_codes(glyph)
+            for code in (codes if len(codes) > 0 else [None]):
+                rows.append(get_glyph_row(file, index, glyph, code))
+        return (rows, missing_charcodes, missing_names)
+
+    codes = set()
+    if charcodes != None:
+        for code in charcodes:
+            if code in index.by_code:
+                codes.add(code)
+            else:
+                missing_charcodes.append(code)
+    if start != None or end != None:
+        codes.update(index.get_code_range(start, end))
+    for code in sorted(codes):
+        rows.append(get_glyph_row(file, index, index.by_code[code], code))
+
+    if names != None:
+        for name in names:
+            glyph = index.by_name.get(name)
+            if glyph == None:
+                missing_names.append(name)
+                continue
+            glyph_codes = get_glyph_codes(glyph)
+            rows.append(get_glyph_row(file, index, glyph, glyph_codes[0] if len(glyph_codes) > 0 else None))
+
+    return (rows, missing_charcodes, missing_names)
+
+results = []
+for file in args.file:
+    font = fontforge.open(file)
+    index = FontIndex(font)
+    (rows, missing_charcodes, missing_names) = query_font(file, index)
+    results.append({
+        "file": file,
+        "em": font.em,
+        "ascent": font.ascent,
+        "descent": font.descent,
+        "glyphs": rows,
+        "missing_charcodes": ["%x" % (code,) for code in missing_charcodes],
+        "missing_names": missing_names,
+    })
+    font.close()
+
+if args.output == "json":
+    print(json.dumps(results, indent=2))
+elif args.output == "csv":
+    writer = csv.writer(sys.stdout, lineterminator="\n")
+    writer.writerow(["file", "code", "name", "width", "points", "xmin", "ymin", "xmax", "ymax", "ligatures"])
+    for result in results:
+        for row in result["glyphs"]:
+            writer.writerow([row["file"], row["code"] if row["code"] != None else "", row["name"], row["width"], row["points"]] + row["bbox"] + [" ".join(row["ligatures"])])
+else:
+    for result in results:
+        if len(results) > 1:
+            print("File: %s" % (result["file"],))
+        print("Font em: %s, ascent=%s, descent=%s," % (result["em"], result["ascent"], result["descent"]))
+        for row in result["glyphs"]:
+            code = int(row["code"], 16) if row["code"] != None else -1
+            print("Char code: %x (%d), name: %s, width: %d, points: %d, bbox: %s%s" % (
+                code, code, row["name"], row["width"], row["points"], tuple(row["bbox"]),
+                ", ligatures: %s" % (", ".join(row["ligatures"]),) if len(row["ligatures"]) > 0 else ""))
+        for code in result["missing_charcodes"]:
+            print("Char code: %s not found" % (code,))
+        for name in result["missing_names"]:
+            print("Name: %s not found" % (name,))
 
-font.close()
\ No newline at end of file
+# Fail when a queried char code or name is missing, e.g. in CI checks
+if any(len(result["missing_charcodes"]) + len(result["missing_names"]) > 0 for result in results):
+    sys.exit(-1)
@@ -1,13 +1,45 @@
 # Install FontForge
 # Add FontForge bin directory to path.
 # Run: fontforge -script svg2webfont.py
+# Or import as a module: svg2webfont.build_font(svg2webfont.make_settings(srcdir='./icons/'))
 
-import fontforge
 import argparse
 import sys
 import os
 import xml.etree.ElementTree as ET
 import json
+import copy
+import contextlib
+import re
+import io
+import hashlib
+import multiprocessing
+import multiprocessing.connection
+import concurrent.futures
+import struct
+import tempfile
+import zlib
+import time
+import glob
+import base64
+import math
+
+# FontForge and the optional fontTools, used for compressing WOFF 2.0 from
+# the already compiled font, are imported by load_fontforge() before the
+# first build, so that a run with up-to-date outputs can exit without them
+fontforge = None
+fonttools_woff2 = None
+
+def load_fontforge():
+    global fontforge, fonttools_woff2
+    if fontforge == None:
+        import fontforge as fontforge_module
+        fontforge = fontforge_module
+        try:
+            from fontTools.ttLib import woff2 as fonttools_woff2_module
+            fonttools_woff2 = fonttools_woff2_module
+        except ImportError:
+            pass
 
 class Rect:
     def __init__(self,
@@ -71,44 +103,6 @@ def assert_dst_file_path(filepath:str, param:str):
         print('directory %s of %s does not exist or is not a valid directory' % (path, param,))
         sys.exit(-1)
 
-def get_arg_or_config(glyph_name, param: str):
-    global args, config
-
-    if glyph_name in config and param in config[glyph_name]:
-        return  config[glyph_name][param]
-    return vars(args)[param]
-
-def get_int_arg_or_config(glyph_name, param: str):
-    global args, config
-
-    if config != None:
-        if glyph_name in config and param in config[glyph_name] and config[glyph_name][param] != '':
-            return parse_int_param(param, config[glyph_name][param])
-    return parse_int_param(param, vars(args)[param])
-
-def get_float_arg_or_config(glyph_name, param: str):
-    global args, config
-
-    if config != None:
-        if glyph_name in config and param in config[glyph_name] and config[glyph_name][param] != '':
-            return parse_float_param(param, config[glyph_name][param])
-    return parse_float_param(param, vars(args)[param])
-
-
-def parse_int_param(param, s:str|int):
-    try:
-        return int(s)
-    except ValueError:
-        print('bad %s value: %s' % (param, s))
-        sys.exit(-1)
-
-def parse_float_param(param, s:str|float|int):
-    try:
-        return float(s)
-    except ValueError:
-        print('bad %s value: %s' % (param, s))
-        sys.exit(-1)
-
 def get_rel_path(from_file:str, to_file:str, to_url:bool):
     
     (from_path, _) = os.path.split(from_file)
@@ -148,18 +142,592 @@ def format_font_file_src_css(font_file_fs_path:str, css_fs_path:str, override_ur
     
     return 'url("%s") format("%s")' % (esc_html_dq_str(url), esc_html_dq_str(css_format))
 
-def get_svg_viewbox(path):
+# Sizes of absolute SVG length units in user units (px)
+SVG_LENGTH_UNITS = {
+    '': 1.0,
+    'px': 1.0,
+    'pt': 96.0 / 72.0,
+    'pc': 16.0,
+    'mm': 96.0 / 25.4,
+    'cm': 96.0 / 2.54,
+    'in': 96.0,
+}
+
+SVG_LENGTH_RE = re.compile(r'^\s*([-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)\s*([a-zA-Z%]*)\s*$')
+
+def parse_svg_length(s:str):
+    # Return the length in user units or None if it is relative (e.g. %) or invalid
+    match = SVG_LENGTH_RE.match(s)
+    if match == None:
+        return None
+    unit = SVG_LENGTH_UNITS.get(match.group(2).lower())
+    if unit == None:
+        return None
+    return float(match.group(1)) * unit
+
+def read_svg_root_attrib(svg_bytes:bytes, chunk_size:int = 4096):
+    # Parse only up to the start tag of the root element and return its attributes
+    parser = ET.XMLPullParser(events=('start',))
+    for offset in range(0, len(svg_bytes), chunk_size):
+        parser.feed(svg_bytes[offset:offset + chunk_size])
+        for (_, element) in parser.read_events():
+            return element.attrib
+    return None
+
+def get_svg_viewbox(svg_bytes:bytes):
     #SVG viewbox has the origin on top left with positive values going right and down
-    tree = ET.parse(path)
-    root = tree.getroot()
-    if 'viewBox' in root.attrib:
-        parts = root.attrib['viewBox'].split()
+    try:
+        attrib = read_svg_root_attrib(svg_bytes)
+    except ET.ParseError:
+        return None
+    if attrib == None:
+        return None
+    if 'viewBox' in attrib:
+        parts = re.split(r'[\s,]+', attrib['viewBox'].strip())
         if len(parts) == 4:
-            return Rect(x1=float(parts[0]), y1=float(parts[1]), width=float(parts[2]), height=float(parts[3]))
-    if 'width' in root.attrib and 'height' in root.attrib:
-        return Rect(x1=0.0, y1=0.0, width=float(root.attrib['width']), height=float(root.attrib['height']))
+            try:
+                return Rect(x1=float(parts[0]), y1=float(parts[1]), width=float(parts[2]), height=float(parts[3]))
+            except ValueError:
+                pass
+    if 'width' in attrib and 'height' in attrib:
+        width = parse_svg_length(attrib['width'])
+        height = parse_svg_length(attrib['height'])
+        if width != None and height != None:
+            return Rect(x1=0.0, y1=0.0, width=width, height=height)
+    return None
+
+# Elements FontForge does not import as outlines
+UNSUPPORTED_SVG_ELEMENTS = {
+    'image': 'embedded raster image',
+    'text': 'text not converted to paths',
+    'foreignObject': 'foreign object',
+    'filter': 'filter',
+    'mask': 'mask',
+    'pattern': 'pattern fill',
+}
+
+SVG_PATH_COMMAND_RE = re.compile(r'[MmLlHhVvCcSsQqTtAaZz]')
+
+def analyze_svg(svg_bytes:bytes):
+    # Count the elements, the path commands and the depth of the nested
+    # transforms and list the unsupported elements of an SVG file in a
+    # single streaming pass, raises ET.ParseError for invalid XML
+    stats = {'nodes': 0, 'commands': 0, 'depth': 0, 'unsupported': {}}
+    transforms = [] # whether each open element has a transform
+    depth = 0
+    for (event, element) in ET.iterparse(io.BytesIO(svg_bytes), events=('start', 'end')):
+        if event == 'end':
+            depth -= transforms.pop()
+            element.clear()
+            continue
+        stats['nodes'] += 1
+        tag = element.tag.rsplit('}', 1)[-1]
+        has_transform = 'transform' in element.attrib
+        transforms.append(has_transform)
+        depth += has_transform
+        stats['depth'] = max(stats['depth'], depth)
+        if tag == 'path':
+            stats['commands'] += len(SVG_PATH_COMMAND_RE.findall(element.get('d', '')))
+        elif tag in ('polygon', 'polyline'):
+            stats['commands'] += len(re.findall(r'[^\s,]+', element.get('points', ''))) // 2
+        elif tag in UNSUPPORTED_SVG_ELEMENTS:
+            stats['unsupported'][tag] = stats['unsupported'].get(tag, 0) + 1
+    return stats
+
+# SVG normalization: the elements of an SVG file are flattened into a single
+# path in absolute coordinates with the view box moved to the origin, so
+# FontForge only has to import plain path data
+
+# Bumped when the normalized output changes, part of the normalized file names
+# and of the glyph cache keys of normalized glyphs
+NORMALIZE_VERSION = 1
+
+SVG_NS = '{http://www.w3.org/2000/svg}'
+XLINK_HREF = '{http://www.w3.org/1999/xlink}href'
+
+# Elements whose children are drawn
+SVG_CONTAINER_ELEMENTS = ('svg', 'g', 'a', 'switch')
+
+SVG_PATH_PARAM_COUNTS = {'M': 2, 'L': 2, 'H': 1, 'V': 1, 'C': 6, 'S': 4, 'Q': 4, 'T': 2, 'A': 7, 'Z': 0}
+
+SVG_PATH_SEPARATOR_RE = re.compile(r'[\s,]*')
+SVG_NUMBER_RE = re.compile(r'[\s,]*([-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)')
+SVG_FLAG_RE = re.compile(r'[\s,]*([01])')
+SVG_TRANSFORM_RE = re.compile(r'\s*,?\s*(matrix|translate|scale|rotate|skewX|skewY)\s*\(([^)]*)\)')
+
+IDENTITY_MATRIX = (1.0, 0.0, 0.0, 1.0, 0.0, 0.0)
+
+class SvgNormalizeError(Exception):
+    # The SVG file uses something the normalization does not handle, the
+    # file is then imported as it is
+    pass
+
+def multiply_matrices(m1, m2):
+    # Matrix applying m2 first and then m1
+    (a1, b1, c1, d1, e1, f1) = m1
+    (a2, b2, c2, d2, e2, f2) = m2
+    return (a1 * a2 + c1 * b2,
+            b1 * a2 + d1 * b2,
+            a1 * c2 + c1 * d2,
+            b1 * c2 + d1 * d2,
+            a1 * e2 + c1 * f2 + e1,
+            b1 * e2 + d1 * f2 + f1)
+
+def parse_svg_transform(s:str):
+    # Matrix of an SVG transform attribute, the transforms apply right to left
+    matrix = IDENTITY_MATRIX
+    pos = 0
+    for match in SVG_TRANSFORM_RE.finditer(s):
+        if match.start() != pos:
+            raise SvgNormalizeError('bad transform: %s' % (s,))
+        pos = match.end()
+        (name, params) = match.groups()
+        values = [float(value) for value in SVG_NUMBER_RE.findall(params)]
+        count = len(values)
+        if name == 'matrix' and count == 6:
+            transform_matrix = tuple(values)
+        elif name == 'translate' and count in (1, 2):
+            transform_matrix = (1.0, 0.0, 0.0, 1.0, values[0], values[1] if count == 2 else 0.0)
+        elif name == 'scale' and count in (1, 2):
+            transform_matrix = (values[0], 0.0, 0.0, values[1] if count == 2 else values[0], 0.0, 0.0)
+        elif name == 'rotate' and count in (1, 3):
+            angle = math.radians(values[0])
+            transform_matrix = (math.cos(angle), math.sin(angle), -math.sin(angle), math.cos(angle), 0.0, 0.0)
+            if count == 3:
+                transform_matrix = multiply_matrices(
+                    multiply_matrices((1.0, 0.0, 0.0, 1.0, values[1], values[2]), transform_matrix),
+                    (1.0, 0.0, 0.0, 1.0, -values[1], -values[2]))
+        elif name == 'skewX' and count == 1:
+            transform_matrix = (1.0, 0.0, math.tan(math.radians(values[0])), 1.0, 0.0, 0.0)
+        elif name == 'skewY' and count == 1:
+            transform_matrix = (1.0, math.tan(math.radians(values[0])), 0.0, 1.0, 0.0, 0.0)
+        else:
+            raise SvgNormalizeError('bad transform: %s' % (s,))
+        matrix = multiply_matrices(matrix, transform_matrix)
+    if s[pos:].strip() != '':
+        raise SvgNormalizeError('bad transform: %s' % (s,))
+    return matrix
+
+def tokenize_svg_path(d:str):
+    # Yield the commands of path data with their parameters, repeated
+    # commands are yielded one by one and the pairs after a move as lines
+    pos = SVG_PATH_SEPARATOR_RE.match(d, 0).end()
+    command = None
+    while pos < len(d):
+        if d[pos].upper() in SVG_PATH_PARAM_COUNTS:
+            command = d[pos]
+            pos += 1
+        elif command == None or command in 'Zz':
+            raise SvgNormalizeError('bad path data at %d' % (pos,))
+
+        params = []
+        for i in range(SVG_PATH_PARAM_COUNTS[command.upper()]):
+            # the arc flags can be written without separators, e.g. a1 1 0 01.5.5
+            match = (SVG_FLAG_RE if command in 'Aa' and i in (3, 4) else SVG_NUMBER_RE).match(d, pos)
+            if match == None:
+                raise SvgNormalizeError('bad path data at %d' % (pos,))
+            params.append(float(match.group(1)))
+            pos = match.end()
+        yield (command, params)
+
+        if command == 'M':
+            command = 'L'
+        elif command == 'm':
+            command = 'l'
+        pos = SVG_PATH_SEPARATOR_RE.match(d, pos).end()
+
+def arc_to_cubics(x1:float, y1:float, rx:float, ry:float, angle:float, large_arc:bool, sweep:bool, x2:float, y2:float):
+    # Approximate an SVG elliptical arc with cubic curves of at most 90
+    # degrees each, https://www.w3.org/TR/SVG11/implnote.html#ArcImplementationNotes
+    if (x1, y1) == (x2, y2):
+        return []
+    (rx, ry) = (abs(rx), abs(ry))
+    if rx == 0 or ry == 0:
+        return [('L', (x2, y2))]
+
+    phi = math.radians(angle)
+    (cos_phi, sin_phi) = (math.cos(phi), math.sin(phi))
+    (dx, dy) = ((x1 - x2) / 2.0, (y1 - y2) / 2.0)
+    x1p = cos_phi * dx + sin_phi * dy
+    y1p = -sin_phi * dx + cos_phi * dy
+
+    # Scale up the radii too small to reach the end point
+    radii_scale = (x1p * x1p) / (rx * rx) + (y1p * y1p) / (ry * ry)
+    if radii_scale > 1:
+        rx *= math.sqrt(radii_scale)
+        ry *= math.sqrt(radii_scale)
+
+    numerator = rx * rx * ry * ry - rx * rx * y1p * y1p - ry * ry * x1p * x1p
+    denominator = rx * rx * y1p * y1p + ry * ry * x1p * x1p
+    coef = math.sqrt(max(0.0, numerator / denominator))
+    if large_arc == sweep:
+        coef = -coef
+    cxp = coef * rx * y1p / ry
+    cyp = -coef * ry * x1p / rx
+    cx = cos_phi * cxp - sin_phi * cyp + (x1 + x2) / 2.0
+    cy = sin_phi * cxp + cos_phi * cyp + (y1 + y2) / 2.0
+
+    def get_angle(ux:float, uy:float, vx:float, vy:float):
+        return math.atan2(ux * vy - uy * vx, ux * vx + uy * vy)
+
+    (ux, uy) = ((x1p - cxp) / rx, (y1p - cyp) / ry)
+    (vx, vy) = ((-x1p - cxp) / rx, (-y1p - cyp) / ry)
+    theta = get_angle(1.0, 0.0, ux, uy)
+    delta = get_angle(ux, uy, vx, vy)
+    if not sweep and delta > 0:
+        delta -= 2 * math.pi
+    elif sweep and delta < 0:
+        delta += 2 * math.pi
+
+    def get_point(u:float, v:float):
+        return (cx + rx * u * cos_phi - ry * v * sin_phi, cy + rx * u * sin_phi + ry * v * cos_phi)
+
+    count = max(1, int(math.ceil(abs(delta) / (math.pi / 2) - 1e-9)))
+    step = delta / count
+    k = 4.0 / 3.0 * math.tan(step / 4.0)
+    segments = []
+    for i in range(count):
+        (cos1, sin1) = (math.cos(theta), math.sin(theta))
+        theta += step
+        (cos2, sin2) = (math.cos(theta), math.sin(theta))
+        end = get_point(cos2, sin2) if i < count - 1 else (x2, y2)
+        segments.append(('C', get_point(cos1 - k * sin1, sin1 + k * cos1) + get_point(cos2 + k * sin2, sin2 - k * cos2) + end))
+    return segments
+
+def get_svg_path_segments(d:str):
+    # Convert path data into absolute M, L, C, Q and Z segments
+    segments = []
+    (x, y) = (0.0, 0.0)
+    (start_x, start_y) = (0.0, 0.0)
+    cubic_control = None    # last control point of the previous C or S segment
+    quadratic_control = None # control point of the previous Q or T segment
+
+    for (command, params) in tokenize_svg_path(d):
+        upper = command.upper()
+        (ox, oy) = (x, y) if command != upper else (0.0, 0.0)
+        next_cubic_control = None
+        next_quadratic_control = None
+
+        if upper == 'M':
+            (x, y) = (ox + params[0], oy + params[1])
+            (start_x, start_y) = (x, y)
+            segments.append(('M', (x, y)))
+        elif upper in ('L', 'H', 'V'):
+            if upper == 'L':
+                (x, y) = (ox + params[0], oy + params[1])
+            elif upper == 'H':
+                x = ox + params[0]
+            else:
+                y = oy + params[0]
+            segments.append(('L', (x, y)))
+        elif upper in ('C', 'S'):
+            if upper == 'C':
+                (x1, y1) = (ox + params[0], oy + params[1])
+                params = params[2:]
+            elif cubic_control != None:
+                (x1, y1) = (2 * x - cubic_control[0], 2 * y - cubic_control[1])
+            else:
+                (x1, y1) = (x, y)
+            (x2, y2) = (ox + params[0], oy + params[1])
+            (x, y) = (ox + params[2], oy + params[3])
+            segments.append(('C', (x1, y1, x2, y2, x, y)))
+            next_cubic_control = (x2, y2)
+        elif upper in ('Q', 'T'):
+            if upper == 'Q':
+                (x1, y1) = (ox + params[0], oy + params[1])
+                params = params[2:]
+            elif quadratic_control != None:
+                (x1, y1) = (2 * x - quadratic_control[0], 2 * y - quadratic_control[1])
+            else:
+                (x1, y1) = (x, y)
+            (x, y) = (ox + params[0], oy + params[1])
+            segments.append(('Q', (x1, y1, x, y)))
+            next_quadratic_control = (x1, y1)
+        elif upper == 'A':
+            (x2, y2) = (ox + params[5], oy + params[6])
+            segments.extend(arc_to_cubics(x, y, params[0], params[1], params[2], params[3] != 0, params[4] != 0, x2, y2))
+            (x, y) = (x2, y2)
+        else:
+            segments.append(('Z', ()))
+            (x, y) = (start_x, start_y)
+
+        cubic_control = next_cubic_control
+        quadratic_control = next_quadratic_control
+
+    return segments
+
+def format_svg_number(n:float):
+    s = ('%.4f' % (n,)).rstrip('0').rstrip('.')
+    return '0' if s == '-0' else s
+
+def format_svg_path_segments(segments:list, matrix):
+    # Path data of the segments with their points transformed
+    parts = []
+    for (command, coords) in segments:
+        parts.append(command)
+        for i in range(0, len(coords), 2):
+            (x, y) = transformXY(matrix, (coords[i], coords[i + 1]))
+            parts.append('%s %s' % (format_svg_number(x), format_svg_number(y)))
+    return ' '.join(parts)
+
+def get_svg_shape_path_data(tag:str, element):
+    # Path data of a basic shape element, None for other elements
+
+    def get_length(name:str):
+        value = element.get(name)
+        if value == None:
+            return None
+        length = parse_svg_length(value)
+        if length == None:
+            raise SvgNormalizeError('unsupported %s length: %s' % (name, value))
+        return length
+
+    def get_lengths(*names):
+        return [get_length(name) or 0.0 for name in names]
+
+    if tag == 'path':
+        return element.get('d', '')
+    if tag == 'rect':
+        (x, y, width, height) = get_lengths('x', 'y', 'width', 'height')
+        if width <= 0 or height <= 0:
+            return ''
+        (rx, ry) = (get_length('rx'), get_length('ry'))
+        if rx == None:
+            rx = ry
+        if ry == None:
+            ry = rx
+        rx = min(max(rx or 0.0, 0.0), width / 2.0)
+        ry = min(max(ry or 0.0, 0.0), height / 2.0)
+        if rx == 0 or ry == 0:
+            return 'M%r %r H%r V%r H%r Z' % (x, y, x + width, y + height, x)
+        arc = 'A%r %r 0 0 1 ' % (rx, ry)
+        return ('M%r %r H%r ' % (x + rx, y, x + width - rx) + arc + '%r %r V%r ' % (x + width, y + ry, y + height - ry) +
+                arc + '%r %r H%r ' % (x + width - rx, y + height, x + rx) + arc + '%r %r V%r ' % (x, y + height - ry, y + ry) +
+                arc + '%r %r Z' % (x + rx, y))
+    if tag in ('circle', 'ellipse'):
+        (cx, cy) = get_lengths('cx', 'cy')
+        if tag == 'circle':
+            rx = ry = get_lengths('r')[0]
+        else:
+            (rx, ry) = get_lengths('rx', 'ry')
+        if rx <= 0 or ry <= 0:
+            return ''
+        arc = 'A%r %r 0 1 0 ' % (rx, ry)
+        return 'M%r %r ' % (cx - rx, cy) + arc + '%r %r ' % (cx + rx, cy) + arc + '%r %r Z' % (cx - rx, cy)
+    if tag == 'line':
+        return 'M%r %r L%r %r' % tuple(get_lengths('x1', 'y1', 'x2', 'y2'))
+    if tag in ('polyline', 'polygon'):
+        points = element.get('points', '').strip()
+        if points == '':
+            return ''
+        return 'M' + points + (' Z' if tag == 'polygon' else '')
     return None
 
+def get_svg_presentation_attrib(element, name:str):
+    # Value of a presentation attribute set by the style or the attribute
+    for declaration in element.get('style', '').split(';'):
+        (key, _, value) = declaration.partition(':')
+        if key.strip() == name:
+            return value.strip()
+    return element.get(name)
+
+def is_svg_element_hidden(element):
+    return get_svg_presentation_attrib(element, 'display') == 'none' or get_svg_presentation_attrib(element, 'visibility') == 'hidden'
+
+def normalize_svg(svg_bytes:bytes):
+    # Flatten the drawn elements of an SVG file into a single path: nested
+    # groups and <use> references are resolved, the transforms and the view
+    # box offset applied, basic shapes and arcs converted to curves and all
+    # other elements (metadata, definitions, styles) left out. Stroked
+    # elements are not normalized, FontForge expands their strokes on import.
+    # Returns the normalized SVG file and its view box, which starts at 0, 0.
+    root = ET.fromstring(svg_bytes)
+    svg_viewbox = get_svg_viewbox(svg_bytes)
+    if svg_viewbox == None:
+        raise SvgNormalizeError('no view box')
+
+    ids = {element.get('id'): element for element in root.iter() if element.get('id') != None}
+    paths = []
+
+    def walk(element, matrix, refs:tuple, paint:tuple):
+        if element.tag.startswith('{') and not element.tag.startswith(SVG_NS):
+            return # editor specific elements, e.g. sodipodi:namedview
+        tag = element.tag[len(SVG_NS):] if element.tag.startswith(SVG_NS) else element.tag
+        if is_svg_element_hidden(element):
+            return
+
+        # inherited fill and stroke
+        (fill, stroke) = paint
+        fill = get_svg_presentation_attrib(element, 'fill') or fill
+        stroke = get_svg_presentation_attrib(element, 'stroke') or stroke
+        paint = (fill, stroke)
+
+        if 'transform' in element.attrib:
+            matrix = multiply_matrices(matrix, parse_svg_transform(element.get('transform')))
+
+        if tag in SVG_CONTAINER_ELEMENTS:
+            if tag == 'svg' and element is not root:
+                raise SvgNormalizeError('nested svg element')
+            for child in element:
+                walk(child, matrix, refs, paint)
+            return
+
+        if tag == 'use':
+            href = element.get('href', element.get(XLINK_HREF, ''))
+            if not href.startswith('#') or href[1:] not in ids:
+                return
+            if href in refs:
+                raise SvgNormalizeError('circular reference %s' % (href,))
+            (x, y) = (parse_svg_length(element.get('x', '0')), parse_svg_length(element.get('y', '0')))
+            if x == None or y == None:
+                raise SvgNormalizeError('unsupported use position')
+            matrix = multiply_matrices(matrix, (1.0, 0.0, 0.0, 1.0, x, y))
+            target = ids[href[1:]]
+            if target.tag in (SVG_NS + 'symbol', 'symbol'):
+                if 'viewBox' in target.attrib:
+                    raise SvgNormalizeError('symbol with a view box')
+                for child in target:
+                    walk(child, matrix, refs + (href,), paint)
+            else:
+                walk(target, matrix, refs + (href,), paint)
+            return
+
+        d = get_svg_shape_path_data(tag, element)
+        if d == None or d == '':
+            return
+        if stroke != 'none':
+            raise SvgNormalizeError('stroked %s element' % (tag,))
+        if fill != 'none':
+            paths.append(format_svg_path_segments(get_svg_path_segments(d), matrix))
+
+    walk(root, (1.0, 0.0, 0.0, 1.0, -svg_viewbox.min_x, -svg_viewbox.min_y), (), ('black', 'none'))
+
+    (width, height) = (format_svg_number(svg_viewbox.width), format_svg_number(svg_viewbox.height))
+    data = '<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 %s %s" width="%s" height="%s"><path d="%s"/></svg>' % (
+        width, height, width, height, ' '.join(paths))
+    return (data.encode('utf-8'), Rect(x1=0.0, y1=0.0, width=svg_viewbox.width, height=svg_viewbox.height))
+
+def get_normalized_svg_file(svg_bytes:bytes, dir:str, glyph_name:str):
+    # Path and view box of the normalized SVG file in dir, named by the hash
+    # of the source so it is reused by later builds. Returns None for both
+    # if the file can not be normalized and has to be imported as it is.
+    h = hashlib.sha256(b'normalize-%d\n' % (NORMALIZE_VERSION,))
+    h.update(svg_bytes)
+    path = os.path.join(dir, h.hexdigest() + '.svg')
+
+    try:
+        with open(path, 'rb') as file:
+            data = file.read()
+        os.utime(path) # mark as recently used for eviction
+        return (path, get_svg_viewbox(data))
+    except OSError:
+        pass
+
+    try:
+        (data, svg_viewbox) = normalize_svg(svg_bytes)
+    except (ET.ParseError, SvgNormalizeError, ValueError) as e:
+        print_debug('not normalized: %s' % (e,), glyph_name)
+        return (None, None)
+
+    print_debug('normalized: %d bytes, %d before' % (len(data), len(svg_bytes)), glyph_name)
+
+    tmp_path = '%s.%d.tmp' % (path, os.getpid())
+    write_file(tmp_path, data)
+    os.replace(tmp_path, path)
+    return (path, svg_viewbox)
+
+class Profiler:
+    # Wall and CPU time of the build stages, recorded per glyph for the
+    # per-glyph stages, and the point counts of the glyphs
+
+    def __init__(self):
+        self.events = [] # (stage, glyph name or None, start time, wall time, CPU time, process id)
+        self.points = {} # glyph name -> [points after import, points after cleanup]
+
+    def add(self, stage:str, glyph_name:str, start_time:float, wall_time:float, cpu_time:float):
+        self.events.append((stage, glyph_name, start_time, wall_time, cpu_time, os.getpid()))
+
+    def set_points(self, glyph_name:str, index:int, count:int):
+        self.points.setdefault(glyph_name, [None, None])[index] = count
+
+    def merge(self, other):
+        self.events.extend(other.events)
+        self.points.update(other.points)
+
+    def get_stage_totals(self):
+        stages = {}
+        for (stage, _, _, wall_time, cpu_time, _) in self.events:
+            totals = stages.setdefault(stage, {'wall': 0.0, 'cpu': 0.0, 'count': 0})
+            totals['wall'] += wall_time
+            totals['cpu'] += cpu_time
+            totals['count'] += 1
+        return dict(sorted(stages.items()))
+
+    def get_glyph_totals(self):
+        glyphs = {}
+        for (stage, glyph_name, _, wall_time, cpu_time, _) in self.events:
+            if glyph_name == None:
+                continue
+            totals = glyphs.setdefault(glyph_name, {'wall': 0.0, 'cpu': 0.0, 'stages': {}})
+            totals['wall'] += wall_time
+            totals['cpu'] += cpu_time
+            totals['stages'][stage] = totals['stages'].get(stage, 0.0) + wall_time
+        for (glyph_name, (points_before, points_after)) in self.points.items():
+            if glyph_name in glyphs:
+                glyphs[glyph_name]['points_before'] = points_before
+                glyphs[glyph_name]['points_after'] = points_after
+        return glyphs
+
+    def write_report(self, path:str, top:int):
+        glyphs = self.get_glyph_totals()
+        slowest = sorted(glyphs, key=lambda glyph_name: glyphs[glyph_name]['wall'], reverse=True)[0:top]
+        with open(path, 'w') as file:
+            json.dump({
+                'stages': self.get_stage_totals(),
+                'slowest_glyphs': [dict(name=glyph_name, **glyphs[glyph_name]) for glyph_name in slowest],
+                'glyphs': glyphs,
+            }, file, indent=2)
+
+    def write_trace(self, path:str):
+        # Chrome trace event format, can be opened in chrome://tracing or Perfetto
+        origin = min((event[2] for event in self.events), default=0.0)
+        trace_events = []
+        for (stage, glyph_name, start_time, wall_time, cpu_time, pid) in self.events:
+            trace_event = {
+                'name': stage if glyph_name == None else '%s %s' % (stage, glyph_name),
+                'cat': 'build' if glyph_name == None else 'glyph',
+                'ph': 'X',
+                'ts': round((start_time - origin) * 1000000),
+                'dur': round(wall_time * 1000000),
+                'pid': pid,
+                'tid': pid,
+                'args': {'cpu_ms': round(cpu_time * 1000, 3)},
+            }
+            if glyph_name != None:
+                trace_event['args']['glyph'] = glyph_name
+            trace_events.append(trace_event)
+        with open(path, 'w') as file:
+            json.dump({'traceEvents': trace_events, 'displayTimeUnit': 'ms'}, file)
+
+# Records the build stages when set to a Profiler (--profile or e.g. benchmark.py)
+profiler = None
+
+@contextlib.contextmanager
+def timed(stage:str, glyph_name:str = None):
+    if profiler == None:
+        yield
+        return
+    start_time = time.time()
+    start_wall_time = time.perf_counter()
+    start_cpu_time = time.process_time()
+    try:
+        yield
+    finally:
+        profiler.add(stage, glyph_name, start_time, time.perf_counter() - start_wall_time, time.process_time() - start_cpu_time)
+
+def count_glyph_points(glyph):
+    return sum(len(contour) for contour in glyph.foreground)
+
 def get_glyph_bbox_rect(glyph):
     rect = glyph.boundingBox() # xmin,ymin, xmax,ymax from baseline to ascender
     return Rect(x1=rect[0], y1=rect[1], x2=rect[2], y2=rect[3])
@@ -188,255 +756,259 @@ def print_debug(info:str, char_name:str = None):
         else:
             print(info)
 
-# Parse input arguments
-parser = argparse.ArgumentParser(
-    
-)
-
-parser.add_argument(
-    '-m', '--mode',
-    choices=['class', 'ligature', 'both'],
-    default='ligature',
-    help=("How icons will be referenced in HTML/CSS: 'class' - generate .ico-NAME classes with \\EAXX escapes (legacy), 'ligature' - add GSUB 'liga' table so typing the icon name shows the glyph (default), or 'both'"))
-
-parser.add_argument('-st', '--start', help='Unicode index in hexadecimal form to start from, default: \'EA01\'', default='EA01', type=str)
-parser.add_argument('-src', '--srcdir', help='path to the directory with SVG files, default: \'./src/\'', default='./src/', type=str)
-parser.add_argument('-ff', '--fontfamily', help='CSS font family name, default: \'Icon Font\'', default='Icon Font', type=str)
-parser.add_argument('-gc', '--gencssclass', help='name for the generic CSS class shared by all element instances, default: \'ico\'', default='ico', type=str)
-parser.add_argument('-pr', '--cssclassprefix', help='prefix for the individual font CSS classes, default: \'ico-\'', default='ico-', type=str)
-parser.add_argument('-csc', '--cssfile', help='path to the generated CSS file, default: \'./dist/css/font.css\'', default='./dist/css/font.css', type=str)
-parser.add_argument('-w1', '--woff1file', help='name of the WOFF v1 file, must have \'.woff\' extension, default: \'./dist/fonts/font.woff\'', default='./dist/fonts/font.woff', type=str)
-parser.add_argument('-w2', '--woff2file', help='name of the WOFF v2 file, must have \'.woff2\' extension, default: \'./dist/fonts/font.woff2\'', default='./dist/fonts/font.woff2', type=str)
-parser.add_argument('-htm', '--htmlfile', help='path to an HTML preview file listing all characters, default: \'./dist/preview.html\'', default='./dist/preview.html', type=str)
-parser.add_argument('-fs', '--previewfontsize', help='default font size for HTML preview file, default: \'24px\'', default='24px', type=str)
-parser.add_argument('-cfp', '--css2fontpath', help='override relative path from CSS file to the font files; if empty then will be calculated based on output file paths; pass \'./\' to override to same directory', default='', type=str)
-
-parser.add_argument('-upm', '--upmsize', help='units per em, default 1000', default=1000, type=int)
-parser.add_argument('-asc', '--ascent', help='ascent size (distance from baseline to top), default 800', default=800, type=int)
-parser.add_argument('-des', '--descent', help='descent size (distance from baseline to bottom), default 200', default=200, type=int)
-
-parser.add_argument('-sc', '--scale', help="how to scale the SVG view-box, can be 'in_em', 'over_em', 'in_ascent', 'over_ascent', 'no' or a float scale factor number, default: 'in_em'", default='in_em', type=str)
-parser.add_argument('-ha', '--halign', help="how to align the scaled SVG view-box relative to advance width horizontally, can be 'center','left','right' or a number interpreted as a center in font units, default: 'center'", default='center', type=str)
-parser.add_argument('-va', '--valign', help="how to align the scaled SVG view-box vertically, can be 'ascent_center', 'ascdesc_center','baseline','descent' or a number interpreted as a center in font units, default: 'ascdesc_center'", default='ascdesc_center', type=str)
-parser.add_argument('-x', '--xmove', help='by how many units to move the scaled and aligned SVG view-box horizontally, default: 0', default=0, type=int)
-parser.add_argument('-y', '--ymove', help='by how many units to move the scaled and aligned SVG view-box vertically, default: 0', default=0, type=int)
-
-parser.add_argument('-min', '--minwidth', help="minimal advance width (how much space the font uses horizontally) in font units, besides a number can be 'auto' to match the outline (drawing) width or 'em', default 'em'", default='em', type=str)
-parser.add_argument('-max', '--maxwidth', help="maximal advance width (how much space the font uses horizontally) in font units, besides a number can be 'auto' to match the outline (drawing) width or 'em', default 'auto'", default='auto', type=str)
-parser.add_argument('-sw', '--separation', help='separation width in font units between characters, default 0', default=0, type=int)
-
-parser.add_argument('-cf', '--configfile', help='path to a JSON configuration file for overriding parameter values for individual glyphs', type=str, default="")
-parser.add_argument('-c', '--config', help='JSON configuration text for overriding parameter values for individual glyphs', type=str, default="")
-
-parser.add_argument('-d', '--debug', help='print additional information (e.g. size of each character in font units) helpful for debugging and tuning the font', action='store_true')
-args = parser.parse_args()
-
-if args.start == '':
-    print('-st or --start is required')
-    sys.exit(-1)
-
-if args.config != "" and args.configfile != "":
-    print('it is not allowed to specify both configfile and config')
-    sys.exit(-1)
-elif args.config != "":
-    print(args.config)
-    config = json.loads(args.config)
-elif args.configfile != "":
-    with open(args.configfile, "r") as file:
-        config = json.load(file)
-else:
-    config = {}
-
-# Ensure all directories exist
-if not os.path.exists(args.srcdir):
-    print('svg file directory %s does not exist', args.srcdir)
-    sys.exit(-1)
-
-if args.cssfile != '':
-    assert_dst_file_path(args.cssfile, 'cssfile')
-
-if args.woff1file != '':
-    assert_dst_file_path(args.woff1file, 'woff1file')
-
-if args.woff2file != '':
-    assert_dst_file_path(args.woff2file, 'woff2file')
-
-if args.htmlfile != '':
-    assert_dst_file_path(args.htmlfile, 'htmlfile')
-
-# Format font-face src property value
-if args.cssfile != '':
-
-    if args.fontfamily == '':
-        print('-ff or --fontfamily is required')
-        sys.exit(-1)
-
-    if args.gencssclass == '':
-        print('-gc or --gencssclass is required')
-        sys.exit(-1)
-
-    if args.cssclassprefix == '':
-        print('-pr or --cssclassprefix is required')
-        sys.exit(-1)
-
-    src = []
-    
-    if args.woff2file != '':
-        src.append(format_font_file_src_css(args.woff2file, args.cssfile, args.css2fontpath, 'woff2file', 'woff2', 'woff2'))
-
-    if args.woff1file != '':
-        src.append(format_font_file_src_css(args.woff1file, args.cssfile, args.css2fontpath, 'woff1file', 'woff', 'woff'))
-
-    if len(src) == 0:
-        sys.exit('woff 2.0 or woff file name must be specified')
-
-    fontfamily = esc_html_dq_str(args.fontfamily)
-    
-    ligature_css_rule = ""
-    if args.mode in ('ligature', 'both'):
-        ligature_css_rule='\n	font-variant-ligatures: common-ligatures;'
-
-   # Store css rules in a string array
-    css = ['''
-@font-face {
-	font-family: '%s';
-	src: %s;
-}
-
-.%s {
-	font-family: '%s';
-	font-style: normal;
-	text-rendering: auto;
-	display: inline-block;
-	font-variant: normal;
-	-moz-osx-font-smoothing: grayscale;
-	-webkit-font-smoothing: antialiased;%s
-}
-''' % (fontfamily, ',\n       '.join(src), args.gencssclass, fontfamily, ligature_css_rule)]
-
-    if args.htmlfile != '':
-        html = [\
-'''<html>
-    <head>
-        <title>Font preview</title>
-        <link href="%s" rel="stylesheet">
-        <style>
-            body {
-                background-color: #f3f2f1;
-                text-align: center;
-                padding: 1rem;
-                margin: 0;
-            }
-            #font-list {
-                display: flex;
-                flex-wrap: wrap;
-                align-items: center;
-                justify-content: center; 
-                margin-top: 1rem;
-                gap: 1rem;
-            }
-            #font-list > div {
-                background-color: #fff;
-                box-shadow: 0 1.6px 3.6px 0 rgba(0, 0, 0, 0.132), 0 0.3px 0.9px 0 rgba(0, 0, 0, 0.108);
-                padding: 20px;
-            }
-            #font-list > div > span {
-                display: inline-block;
-                padding-top: 0.5rem;
-                font-size: 1rem;
-            }
-        </style>
-    </head>
-    <body>
-    Icon font size: <input type="text" id="font-size" value="%s" onchange="document.getElementById('font-list').style.fontSize=this.value">
-    <div id="font-list" style="font-size: %s;">
-''' % (esc_html_dq_str(get_rel_path(args.htmlfile, args.cssfile, True)),
-        esc_html_dq_str(args.previewfontsize),
-        esc_html_dq_str(args.previewfontsize))]
-    else:
-        html = None
-
-else:
-    css = None
-    html = None
+# Outline formats of the compiled font: TrueType quadratic outlines with
+# instructions or CFF cubic outlines with PostScript hints
+OUTLINE_FORMATS = ('ttf', 'cff')
 
-# Create a new font
-font = fontforge.font()
-
-font.em = args.upmsize 		# units (points) per 1 em
-font.ascent = args.ascent 	# distance from baseline (where fonts are position) to top for tallest fonts
-font.descent = args.descent # distance from baseline to bottom for fonts that go below baseline
-
-print_debug('font.em=%s, font.ascent=%s, font.descent=%s,' % (font.em, font.ascent, font.descent))
-
-# Set the starting Unicode value
-next_unicode = int(args.start, 16)
-
-# Initi used Unicode value dict
-used_unicodes = {}
-for glyph_name in config:
-    if 'code' in config[glyph_name]:
-        try:
-            used_unicodes[int(config[glyph_name]['code'], 16)] = True
-        except ValueError:
-            print('bad character code %s specified for %s in configuration' % (config[glyph_name]['code'], glyph_name))
-            sys.exit(-1)
+# Extensions of the uncompressed font files by outline format
+OUTLINE_FORMAT_EXTS = {'ttf': '.ttf', 'cff': '.otf'}
 
-# Get the list of SVG files in the directory
-svg_dir = args.srcdir
-if not svg_dir.endswith('/'):
-    svg_dir += '/'
-svg_files = os.listdir(svg_dir)
-svg_files = [f for f in svg_files if f.endswith('.svg')]
-svg_files.sort()
+SCALE_KEYWORDS = ('in_em', 'over_em', 'in_ascent', 'over_ascent')
+HALIGN_KEYWORDS = ('center', 'left', 'right')
+VALIGN_KEYWORDS = ('ascdesc_center', 'ascent_center', 'baseline', 'descent')
 
-max_width = 0.0
-max_height = 0.0
+class GlyphSettings:
+    # Resolved and validated parameters of a glyph
+    __slots__ = ('scale', 'halign', 'valign', 'xmove', 'ymove', 'minwidth', 'maxwidth', 'simplify', 'glyphbudget', 'hinting', 'outline_format', 'normalize', 'code', 'shard')
 
-				   
-svg_file_index = 0
+    # Parameters that can be overridden for individual glyphs in the JSON configuration
+    PARAMS = ('scale', 'halign', 'valign', 'xmove', 'ymove', 'minwidth', 'maxwidth', 'simplify', 'glyphbudget')
 
-# Iterate through the list of SVG files
-for svg_file in svg_files:
-
-    svg_file_index += 1
-
-    glyph_name = svg_file[0:-len('.svg')]
-    if len(glyph_name) == 0:
-        continue
-
-    if config != None and glyph_name in config and 'code' in config[glyph_name]:
-        curr_unicode = int(config[glyph_name]['code'], 16)
-    else:
-        curr_unicode = next_unicode
-        while curr_unicode in used_unicodes:
-            curr_unicode += 1
-        next_unicode = curr_unicode + 1
+    def __init__(self,
+                 scale:str|float|None,
+                 halign:str|int|None,
+                 valign:str|int|None,
+                 xmove:int,
+                 ymove:int,
+                 minwidth:int|None,
+                 maxwidth:int|None,
+                 simplify:float,
+                 glyphbudget:int|None,
+                 hinting:str,
+                 outline_format:str,
+                 normalize:bool,
+                 code:int|None = None,
+                 shard:str|None = None):
+        self.scale = scale          # one of SCALE_KEYWORDS, a factor or None to not scale
+        self.halign = halign        # one of HALIGN_KEYWORDS, a center in font units or None
+        self.valign = valign        # one of VALIGN_KEYWORDS, a center in font units or None
+        self.xmove = xmove
+        self.ymove = ymove
+        self.minwidth = minwidth    # in font units or None for 'auto'
+        self.maxwidth = maxwidth    # in font units or None for 'auto'
+        self.simplify = simplify    # tolerance in font units for simplifying the outlines, 0 to not simplify
+        self.glyphbudget = glyphbudget # maximal approximate compressed size in bytes, 0 for no limit or None for --glyphbudget
+        self.hinting = hinting
+        self.outline_format = outline_format # one of OUTLINE_FORMATS
+        self.normalize = normalize  # import the SVG file flattened by normalize_svg()
+        self.code = code            # code point from the configuration or None to assign the next free one
+        self.shard = shard          # shard tag from the configuration or None
+
+    def get_key(self):
+        # Values affecting the outlines and the width, used in the glyph cache
+        # key. Normalized glyphs also depend on the version of normalize_svg().
+        normalize = NORMALIZE_VERSION if self.normalize else None
+        return [self.scale, self.halign, self.valign, self.xmove, self.ymove, self.minwidth, self.maxwidth, self.simplify, self.hinting, self.outline_format, normalize]
 
-    # Create a glyph
-    glyph = font.createChar(curr_unicode)
+    def __repr__(self):
+        return 'GlyphSettings(%s)' % (', '.join('%s=%r' % (slot, getattr(self, slot)) for slot in GlyphSettings.__slots__),)
+
+def compile_scale(value):
+    if value in SCALE_KEYWORDS:
+        return value
+    if value in ('no', ''):
+        return None
+    return float(value)
+
+def compile_align(value, keywords:tuple):
+    if value in keywords:
+        return value
+    if value == '':
+        return None
+    return int(value)
+
+def compile_width(value, em:int):
+    if value == 'em':
+        return em
+    if value == 'auto':
+        return None
+    return int(value)
+
+def compile_tolerance(value):
+    tolerance = float(value)
+    if tolerance < 0:
+        raise ValueError()
+    return tolerance
+
+def compile_budget(value):
+    budget = int(value)
+    if budget < 0:
+        raise ValueError()
+    return budget
+
+def compile_glyph_settings(glyph_names, args, config:dict):
+    # Resolve the parameters of all glyphs from the arguments and the JSON
+    # configuration in one pass. Returns the settings by glyph name and a list
+    # of validation errors of all glyphs. Glyphs without overrides share the
+    # same settings object.
+
+    errors = []
+
+    def compile_settings(values:dict, code, shard, prefix:str):
+
+        def compile_value(param:str, compile, *compile_args):
+            try:
+                return compile(values[param], *compile_args)
+            except (ValueError, TypeError):
+                errors.append('%sbad %s value: %s' % (prefix, param, values[param]))
+                return None
+
+        if code != None:
+            try:
+                code = int(code, 16)
+            except (ValueError, TypeError):
+                errors.append('%sbad character code %s specified in configuration' % (prefix, code))
+                code = None
+
+        if shard != None and not isinstance(shard, str):
+            errors.append('%sbad shard value: %s' % (prefix, shard))
+            shard = None
+
+        return GlyphSettings(
+            scale=compile_value('scale', compile_scale),
+            halign=compile_value('halign', compile_align, HALIGN_KEYWORDS),
+            valign=compile_value('valign', compile_align, VALIGN_KEYWORDS),
+            xmove=compile_value('xmove', int),
+            ymove=compile_value('ymove', int),
+            minwidth=compile_value('minwidth', compile_width, args.upmsize),
+            maxwidth=compile_value('maxwidth', compile_width, args.upmsize),
+            simplify=compile_value('simplify', compile_tolerance),
+            glyphbudget=compile_value('glyphbudget', compile_budget) if values['glyphbudget'] != None else None,
+            hinting=args.hinting,
+            outline_format=args.outline_format,
+            normalize=args.normalize,
+            code=code,
+            shard=shard)
+
+    # --glyphbudget is applied when checking the sizes, so that only budgets
+    # from the configuration, including 0, override it
+    defaults = {param: vars(args)[param] for param in GlyphSettings.PARAMS}
+    defaults['glyphbudget'] = None
+    default_settings = compile_settings(defaults, None, None, '')
+
+    table = {}
+    for glyph_name in list(glyph_names) + [name for name in config if name not in glyph_names]:
+        overrides = config.get(glyph_name)
+        if not overrides:
+            table[glyph_name] = default_settings
+            continue
+        values = dict(defaults)
+        for param in GlyphSettings.PARAMS:
+            # empty moves in the configuration fall back to the arguments
+            if param in overrides and not (param in ('xmove', 'ymove') and overrides[param] == ''):
+                values[param] = overrides[param]
+        table[glyph_name] = compile_settings(values, overrides.get('code'), overrides.get('shard'), '%s: ' % (glyph_name,))
+
+    return (table, errors)
+
+def serialize_glyph(glyph):
+    # Capture outlines, width and hints of a processed glyph in a JSON friendly form
+    layer = glyph.foreground
+    return {
+        'width': glyph.width,
+        'quadratic': layer.is_quadratic,
+        'contours': [{
+            'closed': contour.closed,
+            'points': [[point.x, point.y, point.on_curve] for point in contour]
+        } for contour in layer],
+        'hhints': [list(hint) for hint in glyph.hhints],
+        'vhints': [list(hint) for hint in glyph.vhints],
+        'dhints': [[list(point) for point in hint] for hint in glyph.dhints], # left and right points and unit vector
+        'ttinstrs': bytes(glyph.ttinstrs).hex(),
+    }
 
-    svg_file_path = os.path.join(svg_dir, svg_file)
+def restore_glyph(glyph, data):
+    # Inverse of serialize_glyph
+    layer = fontforge.layer()
+    layer.is_quadratic = data['quadratic']
+    for item in data['contours']:
+        contour = fontforge.contour()
+        contour.is_quadratic = data['quadratic']
+        for (x, y, on_curve) in item['points']:
+            contour += fontforge.point(x, y, on_curve)
+        contour.closed = item['closed']
+        layer += contour
+    glyph.foreground = layer
+    glyph.hhints = tuple(tuple(hint) for hint in data['hhints'])
+    glyph.vhints = tuple(tuple(hint) for hint in data['vhints'])
+    glyph.dhints = tuple(tuple(tuple(point) for point in hint) for hint in data['dhints'])
+    glyph.ttinstrs = bytes.fromhex(data['ttinstrs'])
+    glyph.width = data['width']
+
+def simplify_glyph(glyph, glyph_name:str, tolerance:float):
+    # Merge collinear segments, drop near-duplicate points and simplify the
+    # curves within the tolerance in font units, keeping the extrema for hinting
+    points_before = count_glyph_points(glyph)
+    with timed('simplify', glyph_name):
+        glyph.simplify(tolerance, ('mergelines', 'removesingletonpoints'))
+    print_debug('points: %d before simplify, %d after' % (points_before, count_glyph_points(glyph)), glyph_name)
+
+def cleanup_glyph(glyph, glyph_name:str, hinting:str, simplify:float):
+    # Clean up the outlines for better scaling once all transforms are done,
+    # each step runs exactly once per glyph. The TrueType instructions are
+    # built later by instruct_font() in the font being generated.
+    with timed('cleanup', glyph_name):
+        glyph.correctDirection()
+        glyph.removeOverlap()
+    if simplify > 0:
+        simplify_glyph(glyph, glyph_name, simplify)
+    with timed('round', glyph_name):
+        glyph.round()              # snap all points to integer font-units
+    if hinting == 'auto':
+        with timed('autohint', glyph_name):
+            glyph.autoHint()       # add the stem hints the instructions are built from
+
+# Font level TrueType instruction tables: shared functions, setup program and control values
+INSTRUCTION_TABLE_TAGS = ('fpgm', 'prep', 'cvt ')
+
+def instruct_font(font):
+    # Build the minimal TrueType instructions of all glyphs. FontForge keeps
+    # the functions, the setup program and the control values the glyph
+    # instructions refer to by index in tables of the font, so they are built
+    # in the font being generated, not where the glyph was hinted (a worker
+    # process, an earlier build restored from the cache or the font a shard
+    # is copied from). The tables are rebuilt from scratch each time.
+    for tag in INSTRUCTION_TABLE_TAGS:
+        font.setTableData(tag, None)
+    font.selection.all()
+    font.autoInstr()
+    font.selection.none()
+
+def process_glyph(font, glyph, glyph_name:str, svg_file_path:str, svg_viewbox:Rect, settings:GlyphSettings, import_path:str = None):
+    # Import the SVG into the glyph, scale and align it and set the advance width.
+    # The outlines are imported from import_path instead of the SVG file if
+    # set, e.g. the normalized file. Returns False if the outlines could not
+    # be imported.
 
     # Import the svg
     # Some paths do not get scaled by importOutlines with scale=True, so use manual scaling below
     # (TODO: figure out why exactly - possibly if they lack viewBox)
     # The outline will get imported on top left corner right below the ascent
     try:
-        glyph.importOutlines(svg_file_path, scale=False) 
+        with timed('import', glyph_name):
+            glyph.importOutlines(import_path if import_path != None else svg_file_path, scale=False)
     except Exception as e:
         print(f"Failed to import outlines from SVG file %s: {e}" % (svg_file_path,))
-        continue
+        return False
+
+    if profiler != None:
+        profiler.set_points(glyph_name, 0, count_glyph_points(glyph))
     
     if is_glyph_empty(glyph):
         print(f"Warning: The SVG file '{svg_file_path}' is either empty or FontForge failed to import outlines from it.")
 
-    # Set name
-    glyph.glyphname = glyph_name
-
-    # Try to read the viewbox info from the SVG
+    # The viewbox info read from the SVG, if any
     # SVG viewbox has the origin on top left with positive values going right and down
-    svg_viewbox = get_svg_viewbox(svg_file_path)
     print_debug('svg viewbox read: %s' % (svg_viewbox,), glyph_name)
 
     # Get the bounding box in the glyph
@@ -458,6 +1030,7 @@ for svg_file in svg_files:
 
         # It appears though that at least version 20230101 does not
         # translate the positions if top left of the viewbox in the SVG is not 0, 0.
+        # (With --normalize the view box of the imported file starts at 0, 0.)
         # E.g. if the viewbox starts at 0, -960 and a dot is down in the middle
         # of the viewbox - 0,-460 - it will get imported at position 0, 1260
         # in glyph - way above the ascent.
@@ -477,7 +1050,7 @@ for svg_file in svg_files:
     # Set or calculate the scale
 
     # Use exact scaling factor if such is specified
-    scale = get_arg_or_config(glyph_name, "scale")
+    scale = settings.scale
     if scale == 'in_em': # touch 1x1 em (usually 1000x1000) from inside
         scale = float(font.em) / max(glyph_viewbox.width, glyph_viewbox.height)
     elif scale == 'over_em': # touch em from outside
@@ -486,10 +1059,6 @@ for svg_file in svg_files:
         scale = float(font.ascent) / max(glyph_viewbox.width, glyph_viewbox.height)
     elif scale == 'over_ascent':
         scale = float(font.ascent) / min(glyph_viewbox.width, glyph_viewbox.height)
-    elif scale != 'no' and scale != '':
-        scale = parse_float_param('scale', scale)
-    else:
-        scale = None
 
     if scale != None:
         # Generate PostScript transformation matrix for scaling
@@ -498,7 +1067,8 @@ for svg_file in svg_files:
         print_debug('scale matrix: %s' % (matrix,), glyph_name)
 
         # Apply scaling matrix to outlines
-        glyph.transform(matrix)
+        with timed('scale', glyph_name):
+            glyph.transform(matrix)
 
         # Apply scaling matrix to viewBox
         glyph_viewbox = glyph_viewbox.transform(matrix)
@@ -509,21 +1079,8 @@ for svg_file in svg_files:
     print_debug('viewbox after scale: %s' % (glyph_viewbox,), glyph_name)
 
     # Calculate the advance width of the font (the space it takes, not the space it is drawn in)
-    adv_min_width = get_arg_or_config(glyph_name, "minwidth")
-    if adv_min_width == 'em':
-        adv_min_width = font.em
-    elif adv_min_width == 'auto':
-        adv_min_width = None
-    else:
-        adv_min_width = parse_int_param("minwidth", adv_min_width)
-
-    adv_max_width = get_arg_or_config(glyph_name, "maxwidth")
-    if adv_max_width == 'em':
-        adv_max_width = font.em
-    elif adv_max_width == 'auto':
-        adv_max_width = None
-    else:
-        adv_max_width = parse_int_param("maxwidth", adv_max_width)
+    adv_min_width = settings.minwidth
+    adv_max_width = settings.maxwidth
 
     advance_width = bbox.width
     if adv_min_width != None and advance_width < adv_min_width:
@@ -534,7 +1091,7 @@ for svg_file in svg_files:
 
     print_debug('advance_width=%s' % (advance_width,), glyph_name) 
 
-    halign = get_arg_or_config(glyph_name, "halign")
+    halign = settings.halign
     print_debug('halign: %s' % (halign,), glyph_name)
 
     if halign == 'center':
@@ -544,16 +1101,16 @@ for svg_file in svg_files:
         x_move = float(advance_width) - glyph_viewbox.width
     elif halign == 'left':
         x_move = -glyph_viewbox.min_x
-    elif halign != '':
-        center = parse_int_param('halign', halign)
+    elif halign != None:
+        center = halign
         x_move = -glyph_viewbox.min_x + center + glyph_viewbox.width / 2.0
     else:
         x_move = 0
 
-    x_move += get_int_arg_or_config(glyph_name, "xmove")
+    x_move += settings.xmove
 
     # Move the center of the viewbox to be in the center of the em vertically
-    valign = get_arg_or_config(glyph_name, "valign")
+    valign = settings.valign
     print_debug('valign: %s' % (valign,), glyph_name)
 
     if valign == 'ascdesc_center':
@@ -566,11 +1123,13 @@ for svg_file in svg_files:
         y_move = -glyph_viewbox.min_y
     elif valign == 'descent':
         y_move = -glyph_viewbox.min_y - float(font.descent)
-    elif valign != '':
-        center = parse_int_param('valign', valign)
+    elif valign != None:
+        center = valign
         y_move = -glyph_viewbox.max_y + center + glyph_viewbox.height / 2.0 
+    else:
+        y_move = 0
 
-    y_move += get_int_arg_or_config(glyph_name, "ymove")
+    y_move += settings.ymove
 
     print_debug('x_move: %d, y_move: %d' % (x_move, y_move), glyph_name)
 
@@ -579,12 +1138,13 @@ for svg_file in svg_files:
 
     print_debug('move matrix: %s' % (matrix,), glyph_name)
 
-    glyph.transform(matrix)
+    with timed('align', glyph_name):
+        glyph.transform(matrix)
+
+    cleanup_glyph(glyph, glyph_name, settings.hinting, settings.simplify)
 
-    # Add hinting & grid-rounding to improve the scaling
-    glyph.round()          # snap all points to integer font-units
-    glyph.autoHint()       # add CVT data and TrueType grid-fitting hints
-    glyph.autoInstr()      # build minimal TrueType instructions
+    if profiler != None:
+        profiler.set_points(glyph_name, 1, count_glyph_points(glyph))
 
     # Set the new width after the transform because transform would transform also the width
     glyph.width = int(round(advance_width))
@@ -592,129 +1152,2170 @@ for svg_file in svg_files:
     bbox = get_glyph_bbox_rect(glyph)
 
     print_debug('bbox after move: %s' % (bbox,), glyph_name)
-    
-    if css != None:
-    
-        if args.mode in  ('class', 'both'):
-            css.append(\
-'''.%s%s::before {
-  content: "\\%s";
-  font-family: "%s";
-}
-''' % (esc_html_dq_str(args.cssclassprefix), esc_html_dq_str(glyph_name), hex(curr_unicode)[2:], esc_html_dq_str(fontfamily)))
 
-        if html != None:
-            if args.mode == 'class' or (args.mode == 'both' and svg_file_index % 2 == 1):
-                html.append('<div><i class="%s %s%s"></i><br><span>%s</span></div>' % (
-                    esc_html_dq_str(args.gencssclass), esc_html_dq_str(args.cssclassprefix), esc_html_dq_str(glyph_name), esc_html_dq_str(glyph_name)))
-            else:
-                html.append('<div><i class="%s">%s</i><br><span>%s</span></div>' % (
-                    esc_html_dq_str(args.gencssclass), esc_html_dq_str(glyph_name), esc_html_dq_str(glyph_name)))
+    return True
+
+class GlyphEntry:
+    # A glyph to be built from an SVG file
+    def __init__(self, index:int, glyph_name:str, unicode:int, svg_file_path:str, settings:GlyphSettings):
+        self.index = index
+        self.glyph_name = glyph_name
+        self.unicode = unicode
+        self.svg_file_path = svg_file_path
+        self.settings = settings
+        self.svg_viewbox = None
+        self.import_path = None # normalized SVG file imported instead of the source
+        self.svg_bytes = None   # contents of the SVG file read by the preflight
+        self.cache_key = None
+        self.data = None # serialized glyph restored from cache or processed by a worker
+        self.cached = False
+        self.failed = False
+        self.glyph = None   # the glyph in the font once added
+        self.added = False  # True if the glyph was built successfully
+        self.shard = None   # name of the font file shard of the glyph
+        self.alias_of = None    # entry with the same outlines whose glyph this entry shares
+        self.alias_data = None  # serialized own glyph of an alias for restoring it
+
+def init_glyph_worker(worker_args, em:int, ascent:int, descent:int, profile:bool):
+    # Set up a worker process with its own scratch font
+    global args, worker_font, profiler
+    args = worker_args
+    load_fontforge()
+    profiler = Profiler() if profile else None
+    worker_font = fontforge.font()
+    worker_font.em = em
+    worker_font.ascent = ascent
+    worker_font.descent = descent
+
+def process_glyph_job(glyph_name:str, svg_file_path:str, svg_viewbox:Rect, settings:GlyphSettings, import_path:str = None):
+    # Process a glyph in the scratch font of a worker and return it serialized
+    # together with the profile of the job
+    global profiler
+    if profiler != None:
+        profiler = Profiler()
+    glyph = worker_font.createChar(-1, glyph_name)
+    try:
+        if not process_glyph(worker_font, glyph, glyph_name, svg_file_path, svg_viewbox, settings, import_path):
+            return (None, profiler)
+        return (serialize_glyph(glyph), profiler)
+    finally:
+        worker_font.removeGlyph(glyph)
+
+def process_glyphs_in_pool(entries:list, font, jobs:int):
+    # Fan the per-glyph pipeline out to worker processes. The results are
+    # returned in the order of the entries and get added to the font by the
+    # caller, so the output does not depend on which worker finishes first.
+    if len(entries) == 0:
+        return
+
+    with concurrent.futures.ProcessPoolExecutor(
+            max_workers=jobs,
+            mp_context=get_mp_context(),
+            initializer=init_glyph_worker,
+            initargs=(args, font.em, font.ascent, font.descent, profiler != None)) as executor:
+        results = executor.map(
+            process_glyph_job,
+            [entry.glyph_name for entry in entries],
+            [entry.svg_file_path for entry in entries],
+            [entry.svg_viewbox for entry in entries],
+            [entry.settings for entry in entries],
+            [entry.import_path for entry in entries],
+            chunksize=max(1, len(entries) // (jobs * 4)))
+        for (entry, (data, job_profiler)) in zip(entries, results):
+            entry.data = data
+            entry.failed = data == None
+            if job_profiler != None and profiler != None:
+                profiler.merge(job_profiler)
+
+class GlyphWorker:
+    # A worker process processing one glyph at a time, so that a glyph over
+    # the time budget can be stopped by killing its process
+    def __init__(self, mp_context, initargs:tuple):
+        (self.conn, child_conn) = mp_context.Pipe()
+        self.process = mp_context.Process(target=run_glyph_worker, args=(child_conn,) + initargs, daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.entry = None
+        self.deadline = None
+
+    def start(self, entry:GlyphEntry, timeout:float):
+        self.entry = entry
+        self.deadline = time.monotonic() + timeout
+        self.conn.send((entry.glyph_name, entry.svg_file_path, entry.svg_viewbox, entry.settings, entry.import_path))
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.process.join()
+        self.conn.close()
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+def run_glyph_worker(conn, worker_args, em:int, ascent:int, descent:int, profile:bool):
+    # Main loop of a GlyphWorker process, None stops it
+    init_glyph_worker(worker_args, em, ascent, descent, profile)
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            return
+        if job == None:
+            return
+        conn.send(process_glyph_job(*job))
+
+def get_mp_context():
+    # Forked processes share the already loaded modules
+    if 'fork' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('fork')
+    return multiprocessing.get_context()
+
+def process_glyphs_in_workers(entries:list, font, jobs:int, timeout:float):
+    # Process the glyphs in worker processes like process_glyphs_in_pool, but
+    # one glyph at a time per process, killing the process of a glyph that
+    # takes longer than timeout seconds. Such a glyph is reported and
+    # skipped, and a new process takes over its place.
+    initargs = (args, font.em, font.ascent, font.descent, profiler != None)
+    mp_context = get_mp_context()
+    idle = []
+    busy = {} # workers by their connection
+    next_index = 0
 
-# Set the font's encoding to Unicode
-font.encoding = 'unicode'
+    try:
+        while next_index < len(entries) or len(busy) > 0:
+            while next_index < len(entries) and len(busy) < jobs:
+                worker = idle.pop() if len(idle) > 0 else GlyphWorker(mp_context, initargs)
+                worker.start(entries[next_index], timeout)
+                busy[worker.conn] = worker
+                next_index += 1
+
+            wait_time = min(worker.deadline for worker in busy.values()) - time.monotonic()
+            for conn in multiprocessing.connection.wait(list(busy), max(wait_time, 0)):
+                worker = busy.pop(conn)
+                entry = worker.entry
+                try:
+                    (entry.data, job_profiler) = conn.recv()
+                except EOFError:
+                    print('Failed to process SVG file %s: the worker process exited' % (entry.svg_file_path,))
+                    (entry.data, job_profiler) = (None, None)
+                    worker.kill()
+                else:
+                    idle.append(worker)
+                entry.failed = entry.data == None
+                if job_profiler != None and profiler != None:
+                    profiler.merge(job_profiler)
+
+            now = time.monotonic()
+            for worker in [worker for worker in busy.values() if worker.deadline <= now]:
+                del busy[worker.conn]
+                print('Skipped SVG file %s: processing took longer than %s s' % (worker.entry.svg_file_path, timeout))
+                worker.entry.failed = True
+                worker.kill()
+    finally:
+        for worker in busy.values():
+            worker.kill()
+        for worker in idle:
+            worker.stop()
+
+class GlyphCache:
+    # On-disk cache of processed glyphs keyed by the SVG file contents and
+    # the parameters that affect the outlines, one JSON file per glyph, and
+    # of the normalized SVG files
+    VERSION = 5
+
+    def __init__(self, dir:str, max_size:int, font_metrics:tuple):
+        self.dir = dir
+        self.max_size = max_size
+        self.font_metrics = font_metrics # em, ascent and descent
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(dir, exist_ok=True)
+
+    def get_key(self, svg_bytes:bytes, settings:GlyphSettings):
+        h = hashlib.sha256()
+        h.update(json.dumps([GlyphCache.VERSION, fontforge.version(), self.font_metrics, settings.get_key()]).encode('utf-8'))
+        h.update(svg_bytes)
+        return h.hexdigest()
+
+    def get_path(self, key:str):
+        return os.path.join(self.dir, key + '.json')
+
+    def has(self, key:str):
+        return os.path.exists(self.get_path(key))
+
+    def load(self, key:str):
+        path = self.get_path(key)
+        try:
+            with open(path, 'r') as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        try:
+            os.utime(path) # mark as recently used for eviction
+        except OSError:
+            pass
+        self.hits += 1
+        return data
+
+    def store(self, key:str, data):
+        path = self.get_path(key)
+        tmp_path = '%s.%d.tmp' % (path, os.getpid())
+        with open(tmp_path, 'w') as file:
+            json.dump(data, file, separators=(',', ':'))
+        os.replace(tmp_path, path)
+
+    def prune(self):
+        # Evict the least recently used entries until the cache fits into max_size
+        entries = []
+        total_size = 0
+        for entry in os.scandir(self.dir):
+            if entry.is_file() and entry.name.endswith(('.json', '.svg')):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total_size += stat.st_size
+        entries.sort()
+        for (_, size, path) in entries:
+            if total_size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total_size -= size
+
+def read_sfnt_tables(sfnt:bytes):
+    # Return the sfnt version and a list of (tag, checksum, data) sorted by tag
+    (flavor, num_tables) = struct.unpack('>IH', sfnt[0:6])
+    tables = []
+    for i in range(num_tables):
+        (tag, checksum, offset, length) = struct.unpack('>4sIII', sfnt[12 + 16 * i:28 + 16 * i])
+        tables.append((tag, checksum, sfnt[offset:offset + length]))
+    tables.sort()
+    return (flavor, tables)
+
+def calc_table_checksum(data:bytes):
+    data += b'\0' * (-len(data) % 4)
+    return sum(struct.unpack('>%dI' % (len(data) // 4,), data)) & 0xFFFFFFFF
+
+def build_sfnt(flavor:int, tables:list):
+    # Assemble sfnt data from a list of (tag, data) sorted by tag, computing the checksums
+    num_tables = len(tables)
+    entry_selector = max(num_tables.bit_length() - 1, 0)
+    search_range = 16 << entry_selector
+    header = struct.pack('>IHHHH', flavor, num_tables, search_range, entry_selector, num_tables * 16 - search_range)
+
+    offset = 12 + 16 * num_tables
+    head_offset = None
+    directory = []
+    blocks = []
+    for (tag, data) in tables:
+        if tag == b'head':
+            data = data[0:8] + b'\0\0\0\0' + data[12:] # checkSumAdjustment is computed below
+            head_offset = offset
+        directory.append(struct.pack('>4sIII', tag, calc_table_checksum(data), offset, len(data)))
+        blocks.append(data + b'\0' * (-len(data) % 4))
+        offset += len(blocks[-1])
+
+    sfnt = header + b''.join(directory) + b''.join(blocks)
+    if head_offset != None:
+        adjustment = (0xB1B0AFBA - calc_table_checksum(sfnt)) & 0xFFFFFFFF
+        sfnt = sfnt[0:head_offset + 8] + struct.pack('>I', adjustment) + sfnt[head_offset + 12:]
+    return sfnt
+
+def get_source_date_epoch():
+    # Build time for reproducible builds, https://reproducible-builds.org/specs/source-date-epoch/
+    try:
+        return int(os.environ.get('SOURCE_DATE_EPOCH', '0'))
+    except ValueError:
+        return 0
+
+def normalize_sfnt(sfnt:bytes):
+    # Make the compiled font depend only on its contents: drop the FontForge
+    # timestamp table and set the created and modified times in the head
+    # table to SOURCE_DATE_EPOCH (1970 if not set)
+    (flavor, tables) = read_sfnt_tables(sfnt)
+    timestamp = get_source_date_epoch() + 2082844800 # head times count seconds from 1904
+    normalized = []
+    for (tag, _, data) in tables:
+        if tag == b'FFTM':
+            continue
+        if tag == b'head' and len(data) >= 36:
+            data = data[0:20] + struct.pack('>qq', timestamp, timestamp) + data[36:]
+        normalized.append((tag, data))
+    return build_sfnt(flavor, normalized)
+
+def build_woff1(sfnt:bytes):
+    # Wrap compiled sfnt tables into WOFF 1.0 with zlib compressed tables
+    (flavor, tables) = read_sfnt_tables(sfnt)
+
+    major_version, minor_version = 0, 0
+    for (tag, _, data) in tables:
+        if tag == b'head' and len(data) >= 8:
+            (major_version, minor_version) = struct.unpack('>HH', data[4:8]) # fontRevision
+
+    offset = 44 + 20 * len(tables)
+    total_sfnt_size = 12 + 16 * len(tables)
+    directory = []
+    blocks = []
+    for (tag, checksum, data) in tables:
+        compressed = zlib.compress(data, 9)
+        if len(compressed) >= len(data):
+            compressed = data # tables that do not shrink are stored as is
+        directory.append(struct.pack('>4sIIII', tag, offset, len(compressed), len(data), checksum))
+        padding = b'\0' * (-len(compressed) % 4)
+        blocks.append(compressed + padding)
+        offset += len(compressed) + len(padding)
+        total_sfnt_size += len(data) + (-len(data) % 4)
+
+    header = struct.pack('>4sIIHHIHHIIIII',
+        b'wOFF', flavor, offset, len(tables), 0, total_sfnt_size,
+        major_version, minor_version, 0, 0, 0, 0, 0)
+
+    return header + b''.join(directory) + b''.join(blocks)
+
+def has_woff2_compressor():
+    # True if fontTools with brotli is available for build_woff2()
+    return fonttools_woff2 != None and getattr(fonttools_woff2, 'haveBrotli', False)
+
+def build_woff2(sfnt:bytes):
+    # Compress compiled sfnt into WOFF 2.0, returns None if fontTools with brotli is not available
+    if not has_woff2_compressor():
+        return None
+    out = io.BytesIO()
+    fonttools_woff2.compress(io.BytesIO(sfnt), out)
+    return out.getvalue()
+
+def write_file(path:str, data:bytes):
+    with open(path, 'wb') as file:
+        file.write(data)
+
+# Number of hexadecimal digits of the content hash in the output file names
+FILE_HASH_LENGTH = 8
+
+def get_hashed_file_path(path:str, data:bytes):
+    # Insert the content hash before the extension, e.g. font.woff2 -> font.3f9a1c2b.woff2
+    (root, ext) = os.path.splitext(path)
+    return '%s.%s%s' % (root, hashlib.sha256(data).hexdigest()[0:FILE_HASH_LENGTH], ext)
+
+def write_output_file(path:str, data:bytes, hash_names:bool, file_names:dict):
+    # Write an output file, named by its content hash if hash_names is set,
+    # and record the written path in file_names by the configured path
+    written_path = get_hashed_file_path(path, data) if hash_names else path
+    write_file(written_path, data)
+    file_names[path] = written_path
+    return written_path
+
+def compile_sfnt(font, outline_format:str):
+    # Compile the font with TrueType or CFF outlines, FontForge picks the
+    # outline format by the extension
+    (fd, sfnt_path) = tempfile.mkstemp(suffix=OUTLINE_FORMAT_EXTS[outline_format])
+    os.close(fd)
 
-if args.debug:
-    print('font.em: %s, font.ascent=%s, font.descent=%s,' % (font.em, font.ascent, font.descent))
-    for glyph in font.glyphs():
-        bbox = get_glyph_bbox_rect(glyph)
-        print('%s, adv_width=%d, bbox=%s' % (glyph.glyphname, glyph.width, bbox))
-
-# ------------------------------------------------------------------
-# ADD LIGATURE SUPPORT
-# ------------------------------------------------------------------
-
-if args.mode in ('ligature', 'both'):
-
-    # ---------------------------------------------------------------------
-    # 0.  Helper: map every allowed character → the glyph-name we will use.
-    # ---------------------------------------------------------------------
-    AGL = {
-        '0': 'zero',  '1': 'one',  '2': 'two',   '3': 'three', '4': 'four',
-        '5': 'five',  '6': 'six',  '7': 'seven', '8': 'eight', '9': 'nine',
-        '_': 'underscore',
-        '-': 'hyphen',
-    }
+    try:
+        font.generate(sfnt_path)
+        with open(sfnt_path, 'rb') as file:
+            return normalize_sfnt(file.read())
+    finally:
+        os.remove(sfnt_path)
+
+def generate_font_files(font, woff1file:str, woff2file:str, fontfile:str, hash_names:bool = False, file_names:dict = None, outline_format:str = 'ttf'):
+    # Compile the font once and wrap the same sfnt data into WOFF and WOFF 2.0,
+    # returns the compiled sfnt data. The paths of the written files are
+    # recorded in file_names by the configured paths.
+
+    if file_names == None:
+        file_names = {}
+
+    if woff1file == '' and woff2file == '' and fontfile == '':
+        return None
+
+    sfnt = compile_sfnt(font, outline_format)
+
+    if fontfile != '':
+        write_output_file(fontfile, sfnt, hash_names, file_names)
+
+    # zlib and brotli release the GIL, so the two compressions can run in parallel
+    with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+        woff1 = executor.submit(build_woff1, sfnt) if woff1file != '' else None
+        woff2 = executor.submit(build_woff2, sfnt) if woff2file != '' else None
+
+        if woff1 != None:
+            write_output_file(woff1file, woff1.result(), hash_names, file_names)
+
+        if woff2 != None:
+            woff2_data = woff2.result()
+            if woff2_data == None:
+                print_debug('fontTools with brotli not available, generating WOFF 2.0 with FontForge')
+                font.generate(woff2file)
+                with open(woff2file, 'rb') as file:
+                    woff2_data = file.read()
+                if hash_names:
+                    os.remove(woff2file)
+            write_output_file(woff2file, woff2_data, hash_names, file_names)
+
+    return sfnt
+
+AGL = {
+    '0': 'zero',  '1': 'one',  '2': 'two',   '3': 'three', '4': 'four',
+    '5': 'five',  '6': 'six',  '7': 'seven', '8': 'eight', '9': 'nine',
+    '_': 'underscore',
+    '-': 'hyphen',
+}
 
-    def glyph_name_for_char(ch: str) -> str:
-        """
-        Return the glyph name we will *always* use for this character –
-        both when we create the blank placeholder and when we reference it
-        inside a ligature rule.
-        """
-        return AGL.get(ch, ch)            # letters stay the same (“t”, “u”, …)
-
-    # ---------------------------------------------------------------------
-    # 1.  Create zero-width dummy glyphs for every character that can appear
-    #     inside an icon name.
-    # ---------------------------------------------------------------------
-    safe_chars = "abcdefghijklmnopqrstuvwxyz0123456789_-"
-    icon_names  = {g.glyphname for g in font.glyphs()}            # real icons
-    flat_chars  = {c for name in icon_names for c in name
-                   if c in safe_chars}                            # every char
-    dummy_blanks = set()
-
-    for ch in flat_chars:
-        cp     = ord(ch)
+# Characters that can appear inside an icon name used as a ligature
+LIGATURE_CHARS = "abcdefghijklmnopqrstuvwxyz0123456789_-"
+
+def glyph_name_for_char(ch: str) -> str:
+    """
+    Return the glyph name we will *always* use for this character –
+    both when we create the blank placeholder and when we reference it
+    inside a ligature rule.
+    """
+    return AGL.get(ch, ch)            # letters stay the same (“t”, “u”, …)
+
+# Ligature substitution subtables use 16-bit offsets, start a new subtable
+# well before the estimated size reaches the limit
+LIGATURE_SUBTABLE_MAX_SIZE = 60000
+
+def sort_ligature_names(icon_names:list):
+    # Order the names by walking a trie of their characters depth first and
+    # emitting each name after all names it is a prefix of, so that the
+    # longest match always comes first (e.g. arrow_left_2 before arrow_left)
+    # also when the rules are split into several subtables
+    trie = {}
+    for name in icon_names:
+        node = trie
+        for c in name:
+            node = node.setdefault(c, {})
+        node[None] = name
+
+    names = []
+    def walk(node:dict):
+        for c in sorted(key for key in node if key != None):
+            walk(node[c])
+        if None in node:
+            names.append(node[None])
+    walk(trie)
+    return names
+
+def add_ligatures(font, icon_names:list, targets:dict = None):
+    # (Re)build the GSUB 'liga' lookup for the icons, substituting each icon
+    # name with the glyph of the same name or the one given in targets.
+    # Returns the number of rules and subtables.
+
+    # Create zero-width dummy glyphs for every character that can appear
+    # inside an icon name.
+    flat_chars = {c for name in icon_names for c in name
+                  if c in LIGATURE_CHARS}                          # every char
+
+    for ch in sorted(flat_chars):
         g_name = glyph_name_for_char(ch)
 
         if g_name not in font:               # avoid duplicates
-            blank = font.createChar(cp, g_name)
+            blank = font.createChar(ord(ch), g_name)
             blank.width = 0                  # invisible place-holder
-            dummy_blanks.add(g_name)
 
-    # ---------------------------------------------------------------------
-    # 2.  Build the GSUB “liga” lookup
-    # ---------------------------------------------------------------------
+    # Build the GSUB “liga” lookup
+    if 'Ligatures' in font.gsub_lookups:
+        font.removeLookup('Ligatures')
     font.addLookup('Ligatures', 'gsub_ligature', (),
                    (('liga', (('DFLT', ('dflt')),)),))
-    font.addLookupSubtable('Ligatures', 'LigaturesSub')
 
-    for g in font.glyphs():
-        icon_name = g.glyphname          # e.g.  "refresh_2"
+    subtable = None
+    subtable_count = 0
+    subtable_size = 0
+    first_comps = set()
+    rule_count = 0
 
-        # skip the dummy glyphs themselves
-        if icon_name in dummy_blanks:
-            continue
+    for icon_name in sort_ligature_names(icon_names):   # e.g.  "refresh_2"
 
         # turn each character of the icon name into the glyph-name we expect
         comps = tuple(glyph_name_for_char(c) for c in icon_name)
 
         # guard: all component names must exist in the font
-        if all(name in font for name in comps):
-            g.addPosSub('LigaturesSub', comps)
+        if not all(name in font for name in comps):
+            continue
 
+        # estimated growth of the subtable: ligature offset and record, and
+        # a new ligature set with its coverage entry for a new first glyph
+        rule_size = 2 + 4 + 2 * (len(comps) - 1)
+        if comps[0] not in first_comps:
+            rule_size += 2 + 2 + 2
+
+        if subtable == None or subtable_size + rule_size > LIGATURE_SUBTABLE_MAX_SIZE:
+            subtable_count += 1
+            previous = subtable
+            subtable = 'LigaturesSub' if subtable_count == 1 else 'LigaturesSub%d' % (subtable_count,)
+            if previous == None:
+                font.addLookupSubtable('Ligatures', subtable)
+            else:
+                font.addLookupSubtable('Ligatures', subtable, previous)
+            subtable_size = 6 + 4 # subtable and coverage headers
+            first_comps = set()
+            rule_size = 2 + 4 + 2 * (len(comps) - 1) + 2 + 2 + 2
+
+        first_comps.add(comps[0])
+        subtable_size += rule_size
+        target = targets.get(icon_name, icon_name) if targets != None else icon_name
+        font[target].addPosSub(subtable, comps)
+        rule_count += 1
+
+    return (rule_count, subtable_count)
+
+def parse_args(argv:list = None):
+    # Parse input arguments
+    parser = argparse.ArgumentParser(
+
+    )
+
+    parser.add_argument(
+        '-m', '--mode',
+        choices=['class', 'ligature', 'both'],
+        default='ligature',
+        help=("How icons will be referenced in HTML/CSS: 'class' - generate .ico-NAME classes with \\EAXX escapes (legacy), 'ligature' - add GSUB 'liga' table so typing the icon name shows the glyph (default), or 'both'"))
+
+    parser.add_argument('-st', '--start', help='Unicode index in hexadecimal form to start from, default: \'EA01\'', default='EA01', type=str)
+    parser.add_argument('-lf', '--lockfile', help='path to a JSON file keeping the assigned code points between builds, so that added or removed SVG files do not change the code points of the other glyphs; created if it does not exist', default='', type=str)
+    parser.add_argument('-src', '--srcdir', help='path to the directory with SVG files, default: \'./src/\'', default='./src/', type=str)
+    parser.add_argument('-ff', '--fontfamily', help='CSS font family name, default: \'Icon Font\'', default='Icon Font', type=str)
+    parser.add_argument('-gc', '--gencssclass', help='name for the generic CSS class shared by all element instances, default: \'ico\'', default='ico', type=str)
+    parser.add_argument('-pr', '--cssclassprefix', help='prefix for the individual font CSS classes, default: \'ico-\'', default='ico-', type=str)
+    parser.add_argument('-csc', '--cssfile', help='path to the generated CSS file, default: \'./dist/css/font.css\'', default='./dist/css/font.css', type=str)
+    parser.add_argument('-w1', '--woff1file', help='name of the WOFF v1 file, must have \'.woff\' extension, default: \'./dist/fonts/font.woff\'', default='./dist/fonts/font.woff', type=str)
+    parser.add_argument('-w2', '--woff2file', help='name of the WOFF v2 file, must have \'.woff2\' extension, default: \'./dist/fonts/font.woff2\'', default='./dist/fonts/font.woff2', type=str)
+    parser.add_argument('-ttf', '--fontfile', help='path to an optional uncompressed font file generated alongside the WOFF files, must have \'.ttf\' extension, or \'.otf\' with --outline-format cff, default: \'\'', default='', type=str)
+    parser.add_argument('-htm', '--htmlfile', help='path to an HTML preview file listing all characters, default: \'./dist/preview.html\'', default='./dist/preview.html', type=str)
+    parser.add_argument('-fs', '--previewfontsize', help='default font size for HTML preview file, default: \'24px\'', default='24px', type=str)
+    parser.add_argument('-cfp', '--css2fontpath', help='override relative path from CSS file to the font files; if empty then will be calculated based on output file paths; pass \'./\' to override to same directory', default='', type=str)
+
+    parser.add_argument('-hn', '--hashnames', help='name the font, CSS and preview files by their content hash for long-term caching, e.g. \'font.3f9a1c2b.woff2\'', action='store_true')
+    parser.add_argument('-om', '--outputmanifest', help='path to a JSON file mapping the configured output file paths to the written files with their sizes and glyph counts', default='', type=str)
+
+    parser.add_argument('-mc', '--minifycss', help='minify the generated CSS file', action='store_true')
+    parser.add_argument('-if', '--inlinefont', help='maximal size in bytes of a WOFF 2.0 file that is inlined into the CSS as a base64 data URI instead of being referred to by URL, 0 to never inline, default 0', default=0, type=int)
+    parser.add_argument('-pl', '--preloadfile', help='path to a generated HTML snippet with <link rel="preload"> elements for the WOFF 2.0 files not inlined into the CSS', default='', type=str)
+    parser.add_argument('-plu', '--preloadurlpath', help='URL path of the font files as seen from the pages including the preload snippet, e.g. \'/fonts/\'; if empty then relative to the preload file', default='', type=str)
+
+    parser.add_argument('-upm', '--upmsize', help='units per em, default 1000', default=1000, type=int)
+    parser.add_argument('-asc', '--ascent', help='ascent size (distance from baseline to top), default 800', default=800, type=int)
+    parser.add_argument('-des', '--descent', help='descent size (distance from baseline to bottom), default 200', default=200, type=int)
+
+    parser.add_argument('-sc', '--scale', help="how to scale the SVG view-box, can be 'in_em', 'over_em', 'in_ascent', 'over_ascent', 'no' or a float scale factor number, default: 'in_em'", default='in_em', type=str)
+    parser.add_argument('-ha', '--halign', help="how to align the scaled SVG view-box relative to advance width horizontally, can be 'center','left','right' or a number interpreted as a center in font units, default: 'center'", default='center', type=str)
+    parser.add_argument('-va', '--valign', help="how to align the scaled SVG view-box vertically, can be 'ascent_center', 'ascdesc_center','baseline','descent' or a number interpreted as a center in font units, default: 'ascdesc_center'", default='ascdesc_center', type=str)
+    parser.add_argument('-x', '--xmove', help='by how many units to move the scaled and aligned SVG view-box horizontally, default: 0', default=0, type=int)
+    parser.add_argument('-y', '--ymove', help='by how many units to move the scaled and aligned SVG view-box vertically, default: 0', default=0, type=int)
+
+    parser.add_argument('-min', '--minwidth', help="minimal advance width (how much space the font uses horizontally) in font units, besides a number can be 'auto' to match the outline (drawing) width or 'em', default 'em'", default='em', type=str)
+    parser.add_argument('-max', '--maxwidth', help="maximal advance width (how much space the font uses horizontally) in font units, besides a number can be 'auto' to match the outline (drawing) width or 'em', default 'auto'", default='auto', type=str)
+    parser.add_argument('-si', '--simplify', help='tolerance in font units for simplifying the outlines after scaling and aligning: merges collinear segments, drops near-duplicate points and simplifies curves, 0 to not simplify, default 0', default=0, type=float)
+    parser.add_argument('-gb', '--glyphbudget', help='maximal approximate compressed size in bytes of each glyph, the build fails if a glyph exceeds it, 0 for no limit, default 0', default=0, type=int)
+    parser.add_argument('-fb', '--fontbudget', help='maximal total size in bytes of the WOFF 2.0 files (or the WOFF or the uncompressed font files if no WOFF 2.0 files are generated), the build fails if the font exceeds it, 0 for no limit, default 0', default=0, type=int)
+    parser.add_argument('-sr', '--sizereport', help='path to a JSON report with the contours, points, instruction bytes and approximate compressed bytes of each glyph, sorted by the compressed bytes', default='', type=str)
+    parser.add_argument('-sw', '--separation', help='separation width in font units between characters, default 0', default=0, type=int)
+
+    parser.add_argument('-of', '--outline-format', choices=['ttf', 'cff'], default='ttf', help="outlines of the generated fonts: 'ttf' - TrueType quadratic outlines with instructions (default), 'cff' - CFF cubic outlines as in the SVG files with PostScript hints only, often smaller for icons")
+    parser.add_argument('-co', '--compareoutlines', help='also compile the font with the other outline format and print the compressed sizes of both', action='store_true')
+    parser.add_argument('-hi', '--hinting', choices=['auto', 'none'], default='auto', help="'auto' - auto-hint and auto-instruct each glyph (default), 'none' - skip hinting, e.g. for quicker preview builds")
+
+    parser.add_argument('-sh', '--shard', choices=['none', 'prefix', 'tag', 'usage'], default='none', help="split the glyphs into several font files, each with its own @font-face rule and unicode-range so browsers download only the files a page uses: 'prefix' - by the file name part before --shardseparator, 'tag' - by the \"shard\" value in the configuration, 'usage' - by the --shardusage list, default: 'none'; requires 'class' mode")
+    parser.add_argument('-shs', '--shardseparator', help='separator ending the file name prefix used as the shard name with --shard prefix, default: \'-\'', default='-', type=str)
+    parser.add_argument('-shu', '--shardusage', help='path to a JSON file with lists of glyph names by shard name used with --shard usage, e.g. {"common": ["home", "search"]}', default='', type=str)
+
+    parser.add_argument('-sf', '--subset-from', help='comma separated glob patterns of HTML, JS, CSS or other source files (\'**\' matches subdirectories); only the icons referenced in them as ligature text or CSS classes, depending on --mode, are added to the font, CSS and preview', default='', type=str)
+
+    parser.add_argument('-nz', '--normalize', help='flatten each SVG file into a single path before importing it: resolves nested groups and <use> references, applies the transforms and the view box offset, converts basic shapes and arcs to curves and leaves out metadata; files using unsupported features are imported as they are', action='store_true')
+
+    parser.add_argument('-pre', '--preflight', choices=['error', 'warn', 'off'], default='warn', help="how to handle SVG files over the complexity limits or with unsupported elements (e.g. embedded raster images), checked before any FontForge work for the glyphs not in the cache: 'error' - fail the build, 'warn' - print a warning (default), 'off' - do not check")
+    parser.add_argument('-mxn', '--maxnodes', help='maximal number of elements in an SVG file, default 5000', default=5000, type=int)
+    parser.add_argument('-mxc', '--maxpathcommands', help='maximal number of path commands in an SVG file, default 20000', default=20000, type=int)
+    parser.add_argument('-mxd', '--maxtransformdepth', help='maximal depth of nested transforms in an SVG file, default 16', default=16, type=int)
+    parser.add_argument('-gt', '--glyphtimeout', help='time in seconds a glyph may take to import and process; each glyph is then processed in a worker process that is stopped when over the time, and the glyph is reported and skipped; 0 for no limit, default 0', default=0, type=float)
+
+    parser.add_argument('-cf', '--configfile', help='path to a JSON configuration file for overriding parameter values for individual glyphs', type=str, default="")
+    parser.add_argument('-c', '--config', help='JSON configuration text for overriding parameter values for individual glyphs', type=str, default="")
+
+    parser.add_argument('-cd', '--cachedir', help='path to the directory for caching processed glyphs between builds, default: \'./.svg2webfont-cache/\'', default='./.svg2webfont-cache/', type=str)
+    parser.add_argument('-cs', '--cachesize', help='maximal size of the glyph cache in megabytes, least recently used glyphs are evicted beyond it, default 64', default=64, type=int)
+    parser.add_argument('-nc', '--no-cache', help='do not read or write the glyph cache, always process all SVG files', action='store_true')
+
+    parser.add_argument('-nd', '--no-dedupe', help='do not merge glyphs with identical outlines into one glyph mapped to all of their code points', action='store_true')
+
+    parser.add_argument('-j', '--jobs', help='number of worker processes importing and processing the SVG files in parallel, 0 to use all CPUs, default 1', default=1, type=int)
+
+    parser.add_argument('-wa', '--watch', help='keep running after the build and rebuild the changed glyphs and all output files whenever the SVG files or the configuration file change', action='store_true')
+    parser.add_argument('-wi', '--watchinterval', help='interval in seconds for polling the source files in watch mode, default 0.5', default=0.5, type=float)
+    parser.add_argument('-db', '--debounce', help='time in seconds the source files must stay unchanged before a rebuild in watch mode, default 0.3', default=0.3, type=float)
+
+    parser.add_argument('-pf', '--profile', help='path to a JSON report with the wall and CPU time of each build stage and glyph, the point counts of the glyphs and the slowest glyphs', type=str, default='')
+    parser.add_argument('-pt', '--profiletrace', help='path to an additional Chrome trace format file of the profile (chrome://tracing, Perfetto)', type=str, default='')
+    parser.add_argument('-ptop', '--profiletop', help='number of the slowest glyphs listed in the profile report, default 20', default=20, type=int)
+
+    parser.add_argument('-mf', '--manifest', help='path to a JSON file with a list of fonts to build in one process, each item overriding the arguments by their long names, e.g. [{"srcdir": "./icons/", "woff2file": "./dist/icons.woff2"}]; a "config" item value can be an object with the glyph overrides', type=str, default='')
+    parser.add_argument('-mj', '--manifestjobs', help='number of fonts from the manifest built in parallel processes, default 1', default=1, type=int)
+
+    parser.add_argument('-stp', '--stampfile', help='path to a JSON file recording the settings, the input files and the outputs of the build; if nothing changed since, the build is skipped without loading FontForge', type=str, default='')
+    parser.add_argument('-fo', '--force', help='build even if the stamp file shows the outputs are up to date', action='store_true')
+
+    parser.add_argument('-d', '--debug', help='print additional information (e.g. size of each character in font units) helpful for debugging and tuning the font', action='store_true')
+    return parser.parse_args(argv)
+
+def make_settings(**kwargs):
+    # Return build settings with the defaults of the command line arguments
+    # overridden by the keyword arguments named after the long argument
+    # names, e.g. make_settings(srcdir='./icons/', fontfamily='My Icons')
+    settings = parse_args([])
+    for (name, value) in kwargs.items():
+        if not hasattr(settings, name):
+            raise ValueError('unknown setting %s' % (name,))
+        setattr(settings, name, value)
+    return settings
+
+def validate_args(args):
+
+    if args.jobs == 0:
+        args.jobs = os.cpu_count() or 1
+    elif args.jobs < 0:
+        print('-j or --jobs must not be negative')
+        sys.exit(-1)
 
-# ------------------------------------------------------------------
+    if args.start == '':
+        print('-st or --start is required')
+        sys.exit(-1)
 
-# Generate the css file
-if args.cssfile != '':
-    f = open(args.cssfile, 'w')
-    f.write('\n'.join(css))
-    f.close()
+    if args.config != "" and args.configfile != "":
+        print('it is not allowed to specify both configfile and config')
+        sys.exit(-1)
+
+    # Ensure all directories exist
+    if not os.path.exists(args.srcdir):
+        print('svg file directory %s does not exist', args.srcdir)
+        sys.exit(-1)
+
+    if args.cssfile != '':
+        assert_dst_file_path(args.cssfile, 'cssfile')
+
+    if args.woff1file != '':
+        assert_dst_file_path(args.woff1file, 'woff1file')
+
+    if args.woff2file != '':
+        assert_dst_file_path(args.woff2file, 'woff2file')
+
+    if args.fontfile != '':
+        assert_dst_file_path(args.fontfile, 'fontfile')
+        fontfile_ext = OUTLINE_FORMAT_EXTS[args.outline_format]
+        if not args.fontfile.endswith(fontfile_ext):
+            print('fontfile file name must end with %s extension' % (fontfile_ext,))
+            sys.exit(-1)
 
     if args.htmlfile != '':
-        f = open(args.htmlfile, 'w')
-        f.write('\n'.join(html) +
-'''
-</div>
-</body>        
-''')
-        f.close()
-
-# Clean up outlines for better scaling
-font.selection.all()
-font.correctDirection()
-font.removeOverlap()
-font.round()           # snap any stragglers
-font.autoHint()
-font.autoInstr()
-
-# Generate the font files
-if args.woff1file != '':
-    font.generate(args.woff1file) # TrueType-flavoured WOFF 1.0 with a dummy DSIG
-if args.woff2file != '':
-    font.generate(args.woff2file) # TrueType-flavoured WOFF 2.0 with a dummy DSIG
-
-# Close the font
-font.close()
+        assert_dst_file_path(args.htmlfile, 'htmlfile')
+
+    if args.outputmanifest != '':
+        assert_dst_file_path(args.outputmanifest, 'outputmanifest')
+
+    if args.lockfile != '':
+        assert_dst_file_path(args.lockfile, 'lockfile')
+
+    if args.stampfile != '':
+        assert_dst_file_path(args.stampfile, 'stampfile')
+
+    if args.sizereport != '':
+        assert_dst_file_path(args.sizereport, 'sizereport')
+
+    if args.glyphtimeout < 0:
+        print('-gt or --glyphtimeout must not be negative')
+        sys.exit(-1)
+
+    if args.glyphbudget < 0:
+        print('-gb or --glyphbudget must not be negative')
+        sys.exit(-1)
+
+    if args.fontbudget < 0:
+        print('-fb or --fontbudget must not be negative')
+        sys.exit(-1)
+
+    if args.fontbudget > 0 and args.woff1file == '' and args.woff2file == '' and args.fontfile == '':
+        print('fontbudget requires woff1file, woff2file or fontfile')
+        sys.exit(-1)
+
+    if args.inlinefont < 0:
+        print('-if or --inlinefont must not be negative')
+        sys.exit(-1)
+
+    if args.inlinefont > 0 and args.woff2file == '':
+        print('inlinefont requires woff2file')
+        sys.exit(-1)
+
+    if args.preloadfile != '':
+        assert_dst_file_path(args.preloadfile, 'preloadfile')
+        if args.woff2file == '':
+            print('preloadfile requires woff2file')
+            sys.exit(-1)
+
+    if args.profile != '':
+        assert_dst_file_path(args.profile, 'profile')
+
+    if args.shard != 'none':
+        if args.mode != 'class':
+            print('shard requires class mode, ligatures can not span several font files')
+            sys.exit(-1)
+        if args.shard == 'prefix' and args.shardseparator == '':
+            print('-shs or --shardseparator is required')
+            sys.exit(-1)
+        if args.shard == 'usage' and args.shardusage == '':
+            print('-shu or --shardusage is required')
+            sys.exit(-1)
+
+    if args.profiletrace != '':
+        if args.profile == '':
+            print('profiletrace requires profile')
+            sys.exit(-1)
+        assert_dst_file_path(args.profiletrace, 'profiletrace')
+
+    if args.cssfile != '':
+
+        if args.fontfamily == '':
+            print('-ff or --fontfamily is required')
+            sys.exit(-1)
+
+        if args.gencssclass == '':
+            print('-gc or --gencssclass is required')
+            sys.exit(-1)
+
+        if args.cssclassprefix == '':
+            print('-pr or --cssclassprefix is required')
+            sys.exit(-1)
+
+        # Exits if the font file names are not valid
+        format_font_face_src_css(args)
+
+def load_config(args):
+    if args.config != "":
+        print(args.config)
+        return json.loads(args.config)
+    elif args.configfile != "":
+        with open(args.configfile, "r") as file:
+            return json.load(file)
+    return {}
+
+# Shard of the glyphs without a tag or missing from the usage list
+DEFAULT_SHARD = 'other'
+
+SHARD_NAME_RE = re.compile(r'^[A-Za-z0-9_-]+$')
+
+def get_shard_file_path(path:str, shard:str):
+    # Insert the shard name before the extension, e.g. font.woff2 -> font-arrow.woff2
+    if path == '' or shard == None:
+        return path
+    (root, ext) = os.path.splitext(path)
+    return '%s-%s%s' % (root, shard, ext)
+
+def get_shards(entries:list):
+    # Entries by shard name in the order of the first glyph of each shard
+    shards = {}
+    for entry in entries:
+        shards.setdefault(entry.shard, []).append(entry)
+    return shards
+
+def format_unicode_range(codes:list):
+    # Format code points as a CSS unicode-range value merging consecutive ones
+    ranges = []
+    for code in sorted(codes):
+        if len(ranges) > 0 and ranges[-1][1] == code - 1:
+            ranges[-1][1] = code
+        else:
+            ranges.append([code, code])
+    return ', '.join('U+%X' % (first,) if first == last else 'U+%X-%X' % (first, last) for (first, last) in ranges)
+
+def get_written_file_path(path:str, shard:str, file_names:dict):
+    # Path of the written file of a configured output path
+    path = get_shard_file_path(path, shard)
+    if file_names != None:
+        return file_names.get(path, path)
+    return path
+
+def is_font_file_inlined(args, path:str):
+    # True if the written WOFF 2.0 file is small enough to be inlined into the CSS
+    return args.inlinefont > 0 and os.path.getsize(path) <= args.inlinefont
+
+def format_font_face_src_css(args, shard:str = None, file_names:dict = None):
+    # Format font-face src property value, file_names maps the configured
+    # font file paths to the written ones if these differ. Once the font
+    # files are written a small WOFF 2.0 file is inlined as a data URI.
+
+    if file_names != None and args.woff2file != '':
+        path = get_written_file_path(args.woff2file, shard, file_names)
+        if is_font_file_inlined(args, path):
+            with open(path, 'rb') as file:
+                data = file.read()
+            return ['url("data:font/woff2;base64,%s") format("woff2")' % (base64.b64encode(data).decode('ascii'),)]
+
+    def get_font_file_path(path:str):
+        return get_written_file_path(path, shard, file_names)
+
+    src = []
+
+    if args.woff2file != '':
+        src.append(format_font_file_src_css(get_font_file_path(args.woff2file), args.cssfile, args.css2fontpath, 'woff2file', 'woff2', 'woff2'))
+
+    if args.woff1file != '':
+        src.append(format_font_file_src_css(get_font_file_path(args.woff1file), args.cssfile, args.css2fontpath, 'woff1file', 'woff', 'woff'))
+
+    if len(src) == 0:
+        sys.exit('woff 2.0 or woff file name must be specified')
+
+    return src
+
+def format_css(args, entries:list, file_names:dict = None):
+
+    fontfamily = esc_html_dq_str(args.fontfamily)
+
+    # One font face for the whole font or for each shard
+    font_faces = []
+    if args.shard == 'none':
+        font_faces.append((format_font_face_src_css(args, None, file_names), ''))
+    else:
+        for (shard, shard_entries) in get_shards(entries).items():
+            font_faces.append((format_font_face_src_css(args, shard, file_names),
+                               '\n	unicode-range: %s;' % (format_unicode_range([entry.unicode for entry in shard_entries]),)))
+
+    font_face_css = '\n\n'.join('''@font-face {
+	font-family: '%s';
+	src: %s;%s
+}''' % (fontfamily, ',\n       '.join(src), unicode_range_css) for (src, unicode_range_css) in font_faces)
+
+    ligature_css_rule = ""
+    if args.mode in ('ligature', 'both'):
+        ligature_css_rule='\n	font-variant-ligatures: common-ligatures;'
+
+    # Store css rules in a string array
+    css = ['''
+%s
+
+.%s {
+	font-family: '%s';
+	font-style: normal;
+	text-rendering: auto;
+	display: inline-block;
+	font-variant: normal;
+	-moz-osx-font-smoothing: grayscale;
+	-webkit-font-smoothing: antialiased;%s
+}
+''' % (font_face_css, args.gencssclass, fontfamily, ligature_css_rule)]
+
+    if args.mode in  ('class', 'both'):
+        for entry in entries:
+            css.append(\
+'''.%s%s::before {
+  content: "\\%s";
+  font-family: "%s";
+}
+''' % (esc_html_dq_str(args.cssclassprefix), esc_html_dq_str(entry.glyph_name), hex(entry.unicode)[2:], esc_html_dq_str(fontfamily)))
+
+    return '\n'.join(css)
+
+# Whitespace and the strings kept as is in the minified CSS
+CSS_MINIFY_RE = re.compile(r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')|\s*([{}:;,])\s*|\s+')
+
+def minify_css(css:str):
+    # Remove the whitespace around punctuation and the last semicolon in each
+    # block and collapse the rest of it, leaving the strings intact
+
+    def replace(match):
+        if match.group(1) != None:
+            return match.group(1)
+        if match.group(2) != None:
+            return match.group(2)
+        return ' '
+
+    return CSS_MINIFY_RE.sub(replace, css).replace(';}', '}').strip()
+
+def format_preload_html(args, entries:list, file_names:dict):
+    # Format <link rel="preload"> elements for the WOFF 2.0 files not inlined into the CSS
+
+    shards = [None] if args.shard == 'none' else list(get_shards(entries))
+
+    links = []
+    for shard in shards:
+        path = get_written_file_path(args.woff2file, shard, file_names)
+        if is_font_file_inlined(args, path):
+            continue
+        if args.preloadurlpath != '':
+            url = join_url_path(args.preloadurlpath, os.path.basename(path))
+        else:
+            url = get_rel_path(args.preloadfile, path, True)
+        links.append('<link rel="preload" href="%s" as="font" type="font/woff2" crossorigin>' % (esc_html_dq_str(url),))
+
+    return ''.join(link + '\n' for link in links)
+
+def format_html(args, entries:list, cssfile:str = None):
+    # The glyphs are stored as JSON data and the script renders only the rows
+    # scrolled into view, so the page stays fast also with thousands of icons
+
+    icons = []
+    for entry in entries:
+        use_class = args.mode == 'class' or (args.mode == 'both' and entry.index % 2 == 1)
+        icons.append([entry.glyph_name, '%x' % (entry.unicode,), 1 if use_class else 0])
+
+    data = json.dumps({
+        'gencssclass': args.gencssclass,
+        'cssclassprefix': args.cssclassprefix,
+        'icons': icons,
+    }, separators=(',', ':')).replace('</', '<\\/')
+
+    return '''<html>
+    <head>
+        <meta charset="utf-8">
+        <title>Font preview</title>
+        <link href="%s" rel="stylesheet">
+        <style>
+            body {
+                background-color: #f3f2f1;
+                text-align: center;
+                padding: 1rem;
+                margin: 0;
+            }
+            #font-list {
+                position: relative;
+                margin-top: 1rem;
+            }
+            #font-list > div {
+                position: absolute;
+                box-sizing: border-box;
+                width: calc(1em + 40px);
+                min-width: 9rem;
+                background-color: #fff;
+                box-shadow: 0 1.6px 3.6px 0 rgba(0, 0, 0, 0.132), 0 0.3px 0.9px 0 rgba(0, 0, 0, 0.108);
+                padding: 20px;
+                overflow: hidden;
+            }
+            #font-list > div > span {
+                display: block;
+                padding-top: 0.5rem;
+                font-size: 1rem;
+                white-space: nowrap;
+                overflow: hidden;
+                text-overflow: ellipsis;
+            }
+        </style>
+    </head>
+    <body>
+    Icon font size: <input type="text" id="font-size" value="%s">
+    Search: <input type="search" id="search" placeholder="name or code">
+    <span id="count"></span>
+    <div id="font-list" style="font-size: %s;"></div>
+    <script type="application/json" id="icon-data">%s</script>
+    <script>
+    (function () {
+        var GAP = 16; // space between the cells in pixels
+        var data = JSON.parse(document.getElementById('icon-data').textContent);
+        var list = document.getElementById('font-list');
+        var fontSize = document.getElementById('font-size');
+        var search = document.getElementById('search');
+        var count = document.getElementById('count');
+        var icons = data.icons;
+        var cellWidth = 0, cellHeight = 0, columns = 1, left = 0;
+
+        function createCell(icon) {
+            var cell = document.createElement('div');
+            var i = document.createElement('i');
+            if (icon[2]) {
+                i.className = data.gencssclass + ' ' + data.cssclassprefix + icon[0];
+            } else {
+                i.className = data.gencssclass;
+                i.textContent = icon[0];
+            }
+            var span = document.createElement('span');
+            span.textContent = icon[0];
+            span.title = icon[0] + ' U+' + icon[1].toUpperCase();
+            cell.appendChild(i);
+            cell.appendChild(span);
+            return cell;
+        }
+
+        function layout() {
+            // All cells have the same size, measure one of them
+            var probe = createCell(icons.length > 0 ? icons[0] : ['', '0', 0]);
+            probe.style.visibility = 'hidden';
+            list.appendChild(probe);
+            cellWidth = probe.offsetWidth + GAP;
+            cellHeight = probe.offsetHeight + GAP;
+            list.removeChild(probe);
+            columns = Math.max(1, Math.floor((list.clientWidth + GAP) / cellWidth));
+            left = Math.max(0, (list.clientWidth - columns * cellWidth + GAP) / 2);
+            list.style.height = Math.ceil(icons.length / columns) * cellHeight + 'px';
+            render();
+        }
+
+        function render() {
+            var top = window.pageYOffset - (list.getBoundingClientRect().top + window.pageYOffset);
+            var firstRow = Math.max(0, Math.floor(top / cellHeight) - 2);
+            var lastRow = Math.ceil((top + window.innerHeight) / cellHeight) + 2;
+            var end = Math.min(icons.length, lastRow * columns);
+            var fragment = document.createDocumentFragment();
+            for (var index = firstRow * columns; index < end; index++) {
+                var row = Math.floor(index / columns);
+                var cell = createCell(icons[index]);
+                cell.style.left = left + (index - row * columns) * cellWidth + 'px';
+                cell.style.top = row * cellHeight + 'px';
+                fragment.appendChild(cell);
+            }
+            list.textContent = '';
+            list.appendChild(fragment);
+        }
+
+        function filter() {
+            var query = search.value.trim().toLowerCase().replace(/^(u\\+|\\\\|0x)/, '');
+            icons = query == '' ? data.icons : data.icons.filter(function (icon) {
+                return icon[0].toLowerCase().indexOf(query) >= 0 || icon[1].indexOf(query) == 0;
+            });
+            count.textContent = icons.length + ' of ' + data.icons.length + ' icons';
+            layout();
+        }
+
+        fontSize.addEventListener('change', function () {
+            list.style.fontSize = fontSize.value;
+            layout();
+        });
+        search.addEventListener('input', function () {
+            window.scrollTo(0, 0);
+            filter();
+        });
+        window.addEventListener('scroll', render);
+        window.addEventListener('resize', layout);
+        if (document.fonts) {
+            document.fonts.ready.then(layout);
+        }
+        filter();
+    })();
+    </script>
+    </body>
+</html>
+''' % (esc_html_dq_str(get_rel_path(args.htmlfile, cssfile if cssfile != None else args.cssfile, True)),
+        esc_html_dq_str(args.previewfontsize),
+        esc_html_dq_str(args.previewfontsize),
+        data)
+
+def list_svg_files(srcdir:str):
+    # Get the list of SVG files in the directory
+    svg_dir = srcdir
+    if not svg_dir.endswith('/'):
+        svg_dir += '/'
+    svg_files = os.listdir(svg_dir)
+    svg_files = [f for f in svg_files if f.endswith('.svg')]
+    svg_files.sort()
+    return (svg_dir, svg_files)
+
+def create_font(args):
+    # Create a new font
+    font = fontforge.font()
+
+    font.em = args.upmsize 		# units (points) per 1 em
+    font.ascent = args.ascent 	# distance from baseline (where fonts are position) to top for tallest fonts
+    font.descent = args.descent # distance from baseline to bottom for fonts that go below baseline
+
+    # Name the font after the family instead of FontForge's numbered and
+    # dated defaults, so the same input always gives the same font file
+    fontname = re.sub(r'[^A-Za-z0-9-]', '', args.fontfamily)
+    font.fontname = fontname if fontname != '' else 'IconFont'
+    font.familyname = args.fontfamily
+    font.fullname = args.fontfamily
+    font.copyright = ''
+    font.appendSFNTName('English (US)', 'UniqueID', font.fontname)
+
+    print_debug('font.em=%s, font.ascent=%s, font.descent=%s,' % (font.em, font.ascent, font.descent))
+
+    return font
+
+def load_lockfile(args):
+    # Read the code points by glyph name and the retired code points from the
+    # lockfile, returns empty ones if the file does not exist yet
+    if not os.path.exists(args.lockfile):
+        return ({}, {})
+    try:
+        with open(args.lockfile, 'r') as file:
+            lock = json.load(file)
+        codes = {name: int(code, 16) for (name, code) in lock.get('codes', {}).items()}
+        retired = {name: int(code, 16) for (name, code) in lock.get('retired', {}).items()}
+    except (OSError, ValueError, TypeError, AttributeError) as e:
+        print('Failed to load lockfile %s: %s' % (args.lockfile, e))
+        sys.exit(-1)
+    return (codes, retired)
+
+def update_lockfile(args, entries:list):
+    # Write the code points of the entries to the lockfile after a successful
+    # build, the code points of the glyphs no longer present are kept as
+    # retired so they are not reused
+    (codes, retired) = load_lockfile(args)
+    current = {entry.glyph_name: entry.unicode for entry in entries}
+
+    for (glyph_name, code) in codes.items():
+        if glyph_name not in current:
+            print('retired code point %X of %s' % (code, glyph_name))
+            retired[glyph_name] = code
+
+    for entry in entries:
+        if codes.get(entry.glyph_name) != entry.unicode:
+            print_debug('locked code point %X' % (entry.unicode,), entry.glyph_name)
+
+    lock = json.dumps({
+        'codes': {glyph_name: '%X' % (code,) for (glyph_name, code) in current.items()},
+        'retired': {glyph_name: '%X' % (code,) for (glyph_name, code) in retired.items() if glyph_name not in current},
+    }, indent=2, sort_keys=True) + '\n'
+
+    # Leave the file untouched if nothing changed
+    if os.path.exists(args.lockfile):
+        with open(args.lockfile, 'r') as file:
+            if file.read() == lock:
+                return
+
+    with open(args.lockfile, 'w') as file:
+        file.write(lock)
+
+def resolve_glyph_entries(args, svg_dir:str, svg_files:list, glyph_settings:dict):
+    # Assign code points to the SVG files. The code points from the
+    # configuration come first, then the ones from the lockfile, and the
+    # other glyphs get the free code points from the start in the order of
+    # the files, filling the gaps left between the assigned ones.
+
+    # Set the starting Unicode value
+    next_unicode = int(args.start, 16)
+
+    # Initi used Unicode value dict
+    used_unicodes = {}
+    for settings in glyph_settings.values():
+        if settings.code != None:
+            used_unicodes[settings.code] = True
+
+    # Code points kept from the lockfile, including the retired ones of
+    # glyphs added back, unless the configuration assigns them to other glyphs
+    locked_unicodes = {}
+    if args.lockfile != '':
+        (codes, retired) = load_lockfile(args)
+        for (glyph_name, code) in list(retired.items()) + list(codes.items()):
+            if code not in used_unicodes:
+                locked_unicodes[glyph_name] = code
+        for code in list(retired.values()) + list(codes.values()):
+            used_unicodes[code] = True
+
+    svg_file_index = 0
+    entries = []
+
+    for svg_file in svg_files:
+
+        svg_file_index += 1
+
+        glyph_name = svg_file[0:-len('.svg')]
+        if len(glyph_name) == 0:
+            continue
+
+        settings = glyph_settings[glyph_name]
+        if settings.code != None:
+            curr_unicode = settings.code
+        elif glyph_name in locked_unicodes:
+            curr_unicode = locked_unicodes[glyph_name]
+        else:
+            curr_unicode = next_unicode
+            while curr_unicode in used_unicodes:
+                curr_unicode += 1
+            next_unicode = curr_unicode + 1
+
+        entries.append(GlyphEntry(svg_file_index, glyph_name, curr_unicode, os.path.join(svg_dir, svg_file), settings))
+
+    return entries
+
+# Word tokens of the source files that can be icon names or icon CSS classes
+SUBSET_TOKEN_RE = re.compile(r'[\w-]+')
+SUBSET_TOKEN_TAIL_RE = re.compile(r'[\w-]*$')
+
+def list_subset_files(patterns:str):
+    # Files matching the comma separated glob patterns
+    paths = set()
+    for pattern in patterns.split(','):
+        pattern = pattern.strip()
+        if pattern == '':
+            continue
+        matches = [path for path in glob.glob(pattern, recursive=True) if os.path.isfile(path)]
+        if len(matches) == 0:
+            print('no files match %s' % (pattern,))
+        paths.update(matches)
+    return sorted(paths)
+
+def scan_subset_names(args, glyph_names:set, chunk_size:int = 1 << 16):
+    # Names of the glyphs referenced in the --subset-from files. The files are
+    # read in chunks and split into word tokens in a single pass, the tokens
+    # of each chunk are then matched against the glyph names with set
+    # operations instead of searching for each name separately.
+    match_names = args.mode in ('ligature', 'both')
+    match_classes = args.mode in ('class', 'both')
+    prefix = args.cssclassprefix
+
+    found = set()
+
+    def collect(text:str):
+        tokens = set(SUBSET_TOKEN_RE.findall(text))
+        if match_names:
+            found.update(tokens & glyph_names)
+        if match_classes:
+            found.update({token[len(prefix):] for token in tokens if token.startswith(prefix)} & glyph_names)
+
+    paths = list_subset_files(args.subset_from)
+    for path in paths:
+        try:
+            with open(path, 'r', encoding='utf-8', errors='replace') as file:
+                tail = ''
+                while True:
+                    chunk = file.read(chunk_size)
+                    if chunk == '':
+                        break
+                    text = tail + chunk
+                    # keep a token cut at the end of the chunk for the next one
+                    tail = SUBSET_TOKEN_TAIL_RE.search(text).group(0)
+                    collect(text[:len(text) - len(tail)])
+                collect(tail)
+        except OSError as e:
+            print('Failed to read %s: %s' % (path, e))
+
+    print('subset: %d of %d icons referenced in %d files' % (len(found), len(glyph_names), len(paths)))
+
+    return found
+
+def filter_subset_entries(args, entries:list):
+    # Keep only the entries referenced in the --subset-from files. The code
+    # points are assigned before filtering, so they match the full font.
+    if args.subset_from == '':
+        return entries
+    with timed('subset'):
+        names = scan_subset_names(args, {entry.glyph_name for entry in entries})
+    return [entry for entry in entries if entry.glyph_name in names]
+
+def preflight_entries(args, entries:list, glyph_cache:GlyphCache):
+    # Check the SVG files of the entries against the complexity limits and
+    # for unsupported elements before any FontForge work, returns the
+    # problems. The glyphs in the cache are not imported, so not checked.
+    # The file contents and the cache keys are kept in the entries for
+    # add_glyph_entries(), so each file is read and hashed once.
+    problems = []
+    for entry in entries:
+        try:
+            with open(entry.svg_file_path, 'rb') as file:
+                svg_bytes = file.read()
+        except OSError:
+            continue # reported when the glyphs are added
+
+        entry.svg_bytes = svg_bytes
+        if glyph_cache != None:
+            entry.cache_key = glyph_cache.get_key(svg_bytes, entry.settings)
+            if glyph_cache.has(entry.cache_key):
+                continue
+
+        try:
+            stats = analyze_svg(svg_bytes)
+        except ET.ParseError as e:
+            print('Warning: preflight could not parse SVG file %s: %s' % (entry.svg_file_path, e))
+            continue
+
+        if stats['nodes'] > args.maxnodes:
+            problems.append('%s: %d elements, over the limit of %d' % (entry.svg_file_path, stats['nodes'], args.maxnodes))
+        if stats['commands'] > args.maxpathcommands:
+            problems.append('%s: %d path commands, over the limit of %d' % (entry.svg_file_path, stats['commands'], args.maxpathcommands))
+        if stats['depth'] > args.maxtransformdepth:
+            problems.append('%s: transforms nested %d deep, over the limit of %d' % (entry.svg_file_path, stats['depth'], args.maxtransformdepth))
+        for (tag, count) in sorted(stats['unsupported'].items()):
+            problems.append('%s: %d unsupported <%s> elements (%s)' % (entry.svg_file_path, count, tag, UNSUPPORTED_SVG_ELEMENTS[tag]))
+
+        print_debug('preflight: %d elements, %d path commands, transform depth %d' % (stats['nodes'], stats['commands'], stats['depth']), entry.glyph_name)
+
+    return problems
+
+def run_preflight(args, entries:list, glyph_cache:GlyphCache):
+    # Print the preflight problems, returns False if they fail the build
+    if args.preflight == 'off':
+        return True
+    with timed('preflight'):
+        problems = preflight_entries(args, entries, glyph_cache)
+    for problem in problems:
+        print(problem if args.preflight == 'error' else 'Warning: %s' % (problem,))
+    return args.preflight != 'error' or len(problems) == 0
+
+def assign_shards(args, entries:list):
+    # Set the shard names of the entries, returns a list of errors
+    if args.shard == 'none':
+        return []
+
+    usage = {}
+    if args.shard == 'usage':
+        try:
+            with open(args.shardusage, 'r') as file:
+                groups = json.load(file)
+        except (OSError, ValueError) as e:
+            return ['Failed to load shard usage list: %s' % (e,)]
+        if not isinstance(groups, dict) or not all(isinstance(glyph_names, list) for glyph_names in groups.values()):
+            return ['shard usage list must be a JSON object with lists of glyph names']
+        for (shard, glyph_names) in groups.items():
+            for glyph_name in glyph_names:
+                usage.setdefault(glyph_name, shard)
+
+    errors = []
+    for entry in entries:
+        if args.shard == 'prefix':
+            entry.shard = entry.glyph_name.split(args.shardseparator, 1)[0]
+        elif args.shard == 'tag':
+            entry.shard = entry.settings.shard if entry.settings.shard != None else DEFAULT_SHARD
+        else:
+            entry.shard = usage.get(entry.glyph_name, DEFAULT_SHARD)
+        if not SHARD_NAME_RE.match(entry.shard):
+            errors.append('%s: bad shard name: %s' % (entry.glyph_name, entry.shard))
+
+    return errors
+
+def generate_shard_font_files(args, entries:list, file_names:dict, glyph_counts:dict):
+    # Generate the font files of each shard from the glyphs already in the
+    # font, returns the compiled sfnt data of the shards
+    sfnts = []
+    for (shard, shard_entries) in get_shards(entries).items():
+        shard_font = create_font(args)
+        shard_glyphs = {} # glyphs of the shard font by the entry owning the outlines
+        for entry in shard_entries:
+            owner = entry.alias_of if entry.alias_of != None else entry
+            glyph = shard_glyphs.get(owner)
+            if glyph != None:
+                add_altuni(glyph, entry.unicode)
+                continue
+            glyph = shard_font.createChar(entry.unicode)
+            restore_glyph(glyph, serialize_glyph(entry.glyph))
+            glyph.glyphname = entry.glyph_name
+            shard_glyphs[owner] = glyph
+        shard_font.encoding = 'unicode'
+        if args.hinting == 'auto' and args.outline_format == 'ttf':
+            with timed('autoinstr'):
+                instruct_font(shard_font)
+
+        shard_file_names = {}
+        sfnt = generate_font_files(shard_font,
+                            get_shard_file_path(args.woff1file, shard),
+                            get_shard_file_path(args.woff2file, shard),
+                            get_shard_file_path(args.fontfile, shard),
+                            args.hashnames, shard_file_names, args.outline_format)
+        shard_font.close()
+        if sfnt != None:
+            sfnts.append(sfnt)
+
+        file_names.update(shard_file_names)
+        for path in shard_file_names:
+            glyph_counts[path] = len(shard_entries)
+
+        print_debug('shard %s: %d glyphs' % (shard, len(shard_entries)))
+
+    return sfnts
+
+def add_glyph_entries(font, entries:list, glyph_cache:GlyphCache, jobs:int, glyph_timeout:float = 0):
+    # Import, process or restore from the cache the glyphs of the entries and add them to the font
+
+    # The normalized SVG files are kept in the cache directory for later
+    # builds, or in a temporary directory removed once the glyphs are added
+    normalize_dir = None
+    normalize_tmp_dir = None
+
+    for entry in entries:
+        # Read each file once, the bytes are used for both the cache key and
+        # the viewbox, unless the preflight already read it
+        svg_bytes = entry.svg_bytes
+        entry.svg_bytes = None
+        try:
+            if svg_bytes == None:
+                with open(entry.svg_file_path, 'rb') as file:
+                    svg_bytes = file.read()
+        except OSError as e:
+            print("Failed to read SVG file %s: %s" % (entry.svg_file_path, e))
+            entry.failed = True
+        else:
+            if glyph_cache != None:
+                if entry.cache_key == None:
+                    entry.cache_key = glyph_cache.get_key(svg_bytes, entry.settings)
+                entry.data = glyph_cache.load(entry.cache_key)
+                entry.cached = entry.data != None
+            if not entry.cached and entry.settings.normalize:
+                if normalize_dir == None:
+                    if glyph_cache != None:
+                        normalize_dir = glyph_cache.dir
+                    else:
+                        normalize_tmp_dir = tempfile.TemporaryDirectory(prefix='svg2webfont-')
+                        normalize_dir = normalize_tmp_dir.name
+                with timed('normalize', entry.glyph_name):
+                    (entry.import_path, entry.svg_viewbox) = get_normalized_svg_file(svg_bytes, normalize_dir, entry.glyph_name)
+            if not entry.cached and entry.import_path == None:
+                with timed('probe', entry.glyph_name):
+                    entry.svg_viewbox = get_svg_viewbox(svg_bytes)
+
+    # Process the glyphs missing from the cache in worker processes
+    pending = [entry for entry in entries if not entry.cached and not entry.failed]
+    if glyph_timeout > 0:
+        process_glyphs_in_workers(pending, font, jobs, glyph_timeout)
+    elif jobs > 1:
+        process_glyphs_in_pool(pending, font, jobs)
+
+    # Add the glyphs to the font in the order of the SVG files
+    for entry in entries:
+
+        glyph_name = entry.glyph_name
+
+        # Create a glyph
+        glyph = font.createChar(entry.unicode)
+        entry.glyph = glyph
+
+        if entry.failed:
+            continue
+
+        if entry.data != None:
+            with timed('restore', glyph_name):
+                restore_glyph(glyph, entry.data)
+            if entry.cached:
+                print_debug('restored from cache', glyph_name)
+        elif not process_glyph(font, glyph, glyph_name, entry.svg_file_path, entry.svg_viewbox, entry.settings, entry.import_path):
+            continue
+
+        if entry.cache_key != None and not entry.cached:
+            glyph_cache.store(entry.cache_key, entry.data if entry.data != None else serialize_glyph(glyph))
+
+        entry.data = None
+
+        # Set name
+        glyph.glyphname = glyph_name
+        entry.added = True
+
+    if normalize_tmp_dir != None:
+        normalize_tmp_dir.cleanup()
+
+    if glyph_cache != None:
+        glyph_cache.prune()
+        print_debug('glyph cache: %d restored, %d processed' % (glyph_cache.hits, glyph_cache.misses))
+
+def add_altuni(glyph, unicode:int):
+    # Map an additional code point to the glyph
+    glyph.altuni = (glyph.altuni if glyph.altuni != None else ()) + ((unicode, -1, 0),)
+
+def get_outline_fingerprint(data:dict):
+    # Hash of the final outlines and the width of a serialized glyph, the
+    # hints are left out as they follow from the outlines
+    return hashlib.sha256(json.dumps([data['width'], data['quadratic'], data['contours']]).encode('utf-8')).hexdigest()
+
+def estimate_glyph_size(data:dict):
+    # Approximate size in bytes of a serialized glyph in the glyf, loca and
+    # hmtx tables: the header, the contour ends, the instructions and for each
+    # point a flag byte and the x and y deltas of 0, 1 or 2 bytes
+    size = 10 + 2 * len(data['contours']) + 2 + len(data['ttinstrs']) // 2 + 4 + 4
+    (last_x, last_y) = (0, 0)
+    for contour in data['contours']:
+        for (x, y, _) in contour['points']:
+            (dx, dy) = (abs(round(x - last_x)), abs(round(y - last_y)))
+            size += 1 + (0 if dx == 0 else 1 if dx < 256 else 2) + (0 if dy == 0 else 1 if dy < 256 else 2)
+            (last_x, last_y) = (x, y)
+    return size
+
+def merge_duplicate_glyphs(font, entries:list):
+    # Keep a single glyph for each set of identical outlines, the glyphs of
+    # the other entries are removed and their code points mapped to the kept
+    # glyph. Returns the number of removed glyphs and the estimated number of
+    # bytes saved.
+    kept = {}
+    merged_count = 0
+    saved_size = 0
+
+    for entry in entries:
+        if not entry.added:
+            continue
+        data = serialize_glyph(entry.glyph)
+        fingerprint = get_outline_fingerprint(data)
+        first = kept.get(fingerprint)
+        if first == None:
+            kept[fingerprint] = entry
+            continue
+
+        print_debug('same outlines as %s' % (first.glyph_name,), entry.glyph_name)
+        font.removeGlyph(entry.glyph)
+        add_altuni(first.glyph, entry.unicode)
+        entry.glyph = first.glyph
+        entry.alias_of = first
+        entry.alias_data = data
+        merged_count += 1
+        saved_size += estimate_glyph_size(data)
+
+    return (merged_count, saved_size)
+
+def split_duplicate_glyphs(font, entries:list):
+    # Undo merge_duplicate_glyphs giving the aliases their own glyphs again
+    for entry in entries:
+        if entry.alias_of == None:
+            continue
+        glyph = entry.alias_of.glyph
+        altuni = tuple(alt for alt in glyph.altuni if alt[0] != entry.unicode)
+        glyph.altuni = altuni if len(altuni) > 0 else None
+
+        glyph = font.createChar(entry.unicode)
+        restore_glyph(glyph, entry.alias_data)
+        glyph.glyphname = entry.glyph_name
+        entry.glyph = glyph
+        entry.alias_of = None
+        entry.alias_data = None
+
+def finish_font(args, font, entries:list):
+    # Merge the duplicate glyphs, add the ligatures and write the output
+    # files, returns the written file paths by the configured paths and the
+    # errors of the size budgets
+    if not args.no_dedupe:
+        with timed('dedupe'):
+            (merged_count, saved_size) = merge_duplicate_glyphs(font, entries)
+        if merged_count > 0:
+            print('duplicates: %d glyphs share the outlines of others, about %d bytes saved' % (merged_count, saved_size))
+
+    ligature_counts = None
+    if args.mode in ('ligature', 'both'):
+        with timed('ligatures'):
+            ligature_counts = add_ligatures(font,
+                                            [entry.glyph_name for entry in entries if entry.added],
+                                            {entry.glyph_name: entry.alias_of.glyph_name for entry in entries if entry.alias_of != None})
+
+    # The shard fonts are instructed on their own, the font itself only
+    # needs the instructions if it is generated or its sizes are reported
+    if args.hinting == 'auto' and args.outline_format == 'ttf' \
+            and (args.shard == 'none' or args.compareoutlines or needs_glyph_sizes(args, entries)):
+        with timed('autoinstr'):
+            instruct_font(font)
+
+    return write_outputs(args, font, entries, ligature_counts)
+
+def write_build_manifest(path:str, file_names:dict, glyph_counts:dict):
+    # Write a JSON file mapping the configured output paths to the written
+    # files with their sizes and the glyph counts of the fonts, all paths
+    # relative to the manifest
+    base_dir = os.path.dirname(os.path.abspath(path))
+
+    def get_manifest_path(file_path:str):
+        return os.path.relpath(os.path.abspath(file_path), base_dir).replace(os.sep, '/')
+
+    manifest = {}
+    for (logical_path, written_path) in file_names.items():
+        item = {
+            'file': get_manifest_path(written_path),
+            'size': os.path.getsize(written_path),
+        }
+        if logical_path in glyph_counts:
+            item['glyphs'] = glyph_counts[logical_path]
+        manifest[get_manifest_path(logical_path)] = item
+
+    with open(path, 'w') as file:
+        json.dump(manifest, file, indent=2, sort_keys=True)
+        file.write('\n')
+
+# Tables with the outlines and the advance widths of the glyphs
+GLYPH_TABLE_TAGS = (b'glyf', b'loca', b'hmtx', b'CFF ', b'CFF2')
+
+def get_compressed_glyph_tables_size(sfnts:list):
+    # Size of the glyph tables of the fonts compressed with brotli as in
+    # WOFF 2.0, or with zlib as in WOFF if brotli is not available
+    data = b''.join(data for sfnt in sfnts for (tag, _, data) in read_sfnt_tables(sfnt)[1] if tag in GLYPH_TABLE_TAGS)
+    if len(data) == 0:
+        return 0
+    brotli = getattr(fonttools_woff2, 'brotli', None) if fonttools_woff2 != None else None
+    if brotli != None:
+        return len(brotli.compress(data))
+    return len(zlib.compress(data, 9))
+
+def get_glyph_costs(entries:list, sfnts:list):
+    # Contours, points, instruction bytes and approximate uncompressed and
+    # compressed bytes of each glyph, sorted by the compressed bytes. The
+    # compressed size of the glyph tables is split among the glyphs by their
+    # uncompressed sizes. Glyphs shared by duplicates are listed once.
+    owners = {}
+    for entry in entries:
+        owners.setdefault(entry.alias_of if entry.alias_of != None else entry, []).append(entry)
+
+    costs = []
+    for (owner, owner_entries) in owners.items():
+        data = serialize_glyph(owner.glyph)
+        # Budgets from the configuration, the lowest limit wins among duplicates
+        budgets = [entry.settings.glyphbudget for entry in owner_entries if entry.settings.glyphbudget != None]
+        limits = [budget for budget in budgets if budget > 0]
+        costs.append({
+            'name': owner.glyph_name,
+            'code': '%X' % (owner.unicode,),
+            'aliases': [entry.glyph_name for entry in owner_entries if entry is not owner],
+            'contours': len(data['contours']),
+            'points': sum(len(contour['points']) for contour in data['contours']),
+            'instructions': len(data['ttinstrs']) // 2,
+            'bytes': estimate_glyph_size(data),
+            'budget': (min(limits) if len(limits) > 0 else 0) if len(budgets) > 0 else None,
+        })
+
+    compressed_size = get_compressed_glyph_tables_size(sfnts)
+    total_size = sum(cost['bytes'] for cost in costs)
+    for cost in costs:
+        cost['compressed'] = int(round(compressed_size * cost['bytes'] / total_size)) if total_size > 0 else 0
+
+    costs.sort(key=lambda cost: (-cost['compressed'], cost['name']))
+    return costs
+
+def get_font_files_size(file_names:dict, glyph_counts:dict, outline_format:str):
+    # Format and total size of the written WOFF 2.0 files, or of the WOFF or
+    # the uncompressed TrueType or OpenType CFF files if no WOFF 2.0 files
+    # were generated
+    for ext in ('.woff2', '.woff', OUTLINE_FORMAT_EXTS[outline_format]):
+        paths = [path for path in glyph_counts if path.endswith(ext)]
+        if len(paths) > 0:
+            return (ext[1:], sum(os.path.getsize(file_names[path]) for path in paths))
+    return (None, 0)
+
+def check_size_budgets(args, costs:list, font_format:str, font_size:int):
+    # Return the errors for the glyphs and the font over their budgets
+    errors = []
+    for cost in costs:
+        budget = cost['budget'] if cost['budget'] != None else args.glyphbudget
+        if budget > 0 and cost['compressed'] > budget:
+            errors.append('%s: about %d bytes compressed, over the budget of %d bytes (%d contours, %d points, %d instruction bytes)' % (
+                cost['name'], cost['compressed'], budget, cost['contours'], cost['points'], cost['instructions']))
+    if args.fontbudget > 0 and font_size > args.fontbudget:
+        errors.append('%s font files: %d bytes, over the budget of %d bytes' % (font_format, font_size, args.fontbudget))
+    return errors
+
+def format_size_report(costs:list, font_format:str, font_size:int, font_budget:int):
+    return json.dumps({
+        'font': {
+            'format': font_format,
+            'size': font_size,
+            'budget': font_budget if font_budget > 0 else None,
+            'glyphs_compressed': sum(cost['compressed'] for cost in costs),
+        },
+        'glyphs': costs,
+    }, indent=2) + '\n'
+
+def compare_outline_formats(args, font, sfnt:bytes = None):
+    # Print the compressed sizes of the font compiled with each outline
+    # format, reusing the already compiled sfnt data of the chosen one
+    compressed_sizes = {}
+    compressed_format = 'WOFF 2.0'
+    for outline_format in OUTLINE_FORMATS:
+        if outline_format != args.outline_format or sfnt == None:
+            data = compile_sfnt(font, outline_format)
+        else:
+            data = sfnt
+        compressed = build_woff2(data)
+        if compressed == None:
+            compressed = build_woff1(data)
+            compressed_format = 'WOFF'
+        compressed_sizes[outline_format] = len(compressed)
+
+    # Without --hinting auto the TrueType font has no instructions either
+    note = ''
+    if args.outline_format == 'cff' and args.hinting == 'auto':
+        note = ', ttf without instructions'
+
+    other_format = [outline_format for outline_format in OUTLINE_FORMATS if outline_format != args.outline_format][0]
+    size = compressed_sizes[args.outline_format]
+    other_size = compressed_sizes[other_format]
+    print('outlines: %s %s %d bytes, %s %d bytes (%+.1f%%%s)' % (
+        args.outline_format, compressed_format, size, other_format, other_size, (other_size - size) * 100.0 / size if size > 0 else 0.0, note))
+
+def needs_glyph_sizes(args, entries:list):
+    # True if the glyph sizes are reported or checked against budgets
+    return args.sizereport != '' or args.fontbudget > 0 or args.glyphbudget > 0 \
+        or any(entry.settings.glyphbudget != None and entry.settings.glyphbudget > 0 for entry in entries if entry.added)
+
+def write_outputs(args, font, entries:list, ligature_counts:tuple = None):
+    # Generate the font files and write the CSS and the preview files,
+    # returns the written file paths by the configured paths and the errors
+    # of the size budgets
+
+    entries = [entry for entry in entries if entry.added]
+
+    file_names = {}     # written file paths by the configured paths
+    glyph_counts = {}   # glyph counts of the font files by the configured paths
+
+    # Generate the font files first, the CSS refers to their content hashed names
+    sfnt = None
+    with timed('generate'):
+        if args.shard == 'none':
+            sfnt = generate_font_files(font, args.woff1file, args.woff2file, args.fontfile, args.hashnames, file_names, args.outline_format)
+            sfnts = [sfnt] if sfnt != None else []
+            for path in file_names:
+                glyph_counts[path] = len(entries)
+        else:
+            sfnts = generate_shard_font_files(args, entries, file_names, glyph_counts)
+
+    # Generate the css file
+    if args.cssfile != '':
+        with timed('css_html'):
+            css = format_css(args, entries, file_names)
+            if args.minifycss:
+                css = minify_css(css)
+            cssfile = write_output_file(args.cssfile, css.encode('utf-8'), args.hashnames, file_names)
+
+            if args.htmlfile != '':
+                write_output_file(args.htmlfile, format_html(args, entries, cssfile).encode('utf-8'), args.hashnames, file_names)
+
+    # The snippet is included into the pages, so it is not named by its hash
+    if args.preloadfile != '':
+        write_output_file(args.preloadfile, format_preload_html(args, entries, file_names).encode('utf-8'), False, file_names)
+
+    if args.compareoutlines:
+        with timed('compare_outlines'):
+            compare_outline_formats(args, font, sfnt)
+
+    # Sizes of the glyphs and the font files checked against the budgets
+    errors = []
+    if needs_glyph_sizes(args, entries):
+        with timed('sizes'):
+            costs = get_glyph_costs(entries, sfnts)
+            (font_format, font_size) = get_font_files_size(file_names, glyph_counts, args.outline_format)
+            errors = check_size_budgets(args, costs, font_format, font_size)
+        if args.sizereport != '':
+            write_output_file(args.sizereport, format_size_report(costs, font_format, font_size, args.fontbudget).encode('utf-8'), False, file_names)
+            print('sizes: %s font files %d bytes, largest glyphs: %s' % (font_format, font_size,
+                ', '.join('%s %d' % (cost['name'], cost['compressed']) for cost in costs[0:5])))
+
+    if args.outputmanifest != '':
+        write_build_manifest(args.outputmanifest, file_names, glyph_counts)
+        file_names[args.outputmanifest] = args.outputmanifest
+
+    if ligature_counts != None:
+        (rule_count, subtable_count) = ligature_counts
+        gsub_size = 0
+        if sfnt != None:
+            gsub_size = sum(len(data) for (tag, _, data) in read_sfnt_tables(sfnt)[1] if tag == b'GSUB')
+        print('ligatures: %d rules in %d subtables, GSUB table %d bytes' % (rule_count, subtable_count, gsub_size))
+
+    return (file_names, errors)
+
+def compile_glyph_settings_or_exit(args, config:dict, svg_files:list):
+    # Resolve and validate the parameters of all glyphs before any FontForge work
+    (glyph_settings, errors) = compile_glyph_settings([svg_file[0:-len('.svg')] for svg_file in svg_files], args, config)
+    if len(errors) > 0:
+        for error in errors:
+            print(error)
+        sys.exit(-1)
+    return glyph_settings
+
+def open_glyph_cache(args):
+    if args.no_cache:
+        return None
+    return GlyphCache(args.cachedir, args.cachesize * 1024 * 1024, (args.upmsize, args.ascent, args.descent))
+
+# Settings not affecting the output files, left out of the stamp
+STAMP_IGNORED_SETTINGS = ('force', 'stampfile', 'jobs', 'watch', 'watchinterval', 'debounce',
+                          'profile', 'profiletrace', 'profiletop', 'manifest', 'manifestjobs', 'debug')
+
+def get_stamp_settings_hash(args, config:dict):
+    # Hash of this script, the settings and the configuration
+    with open(os.path.abspath(__file__), 'rb') as file:
+        script_hash = hashlib.sha256(file.read()).hexdigest()
+    settings = {name: value for (name, value) in vars(args).items() if name not in STAMP_IGNORED_SETTINGS}
+    return hashlib.sha256(json.dumps([script_hash, settings, config], sort_keys=True).encode('utf-8')).hexdigest()
+
+def list_stamp_inputs(args):
+    # Paths of all files the outputs depend on
+    (svg_dir, svg_files) = list_svg_files(args.srcdir)
+    paths = [os.path.join(svg_dir, svg_file) for svg_file in svg_files]
+    for path in (args.configfile, args.shardusage, args.lockfile):
+        if path != '':
+            paths.append(path)
+    if args.subset_from != '':
+        paths.extend(list_subset_files(args.subset_from))
+    return paths
+
+def get_stamp_inputs(paths:list, previous:dict):
+    # Size, modification time and content hash of each file; the hash is
+    # taken from the previous stamp if the size and the time did not change
+    inputs = {}
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        item = previous.get(path)
+        if item == None or item[0] != stat.st_size or item[1] != stat.st_mtime_ns:
+            with open(path, 'rb') as file:
+                item = [stat.st_size, stat.st_mtime_ns, hashlib.sha256(file.read()).hexdigest()]
+        inputs[path] = item
+    return inputs
+
+def read_stamp(args):
+    try:
+        with open(args.stampfile, 'r') as file:
+            stamp = json.load(file)
+    except (OSError, ValueError):
+        return None
+    return stamp if isinstance(stamp, dict) else None
+
+def is_up_to_date(args, config:dict):
+    # True if the stamp was written for the same settings and input file
+    # contents and all output files are unchanged since
+    stamp = read_stamp(args)
+    if stamp == None or stamp.get('settings') != get_stamp_settings_hash(args, config):
+        return False
+
+    previous = stamp.get('inputs', {})
+    inputs = get_stamp_inputs(list_stamp_inputs(args), previous)
+    if {path: item[2] for (path, item) in inputs.items()} != {path: item[2] for (path, item) in previous.items()}:
+        return False
+
+    for (path, (size, mtime_ns)) in stamp.get('outputs', {}).items():
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return False
+        if stat.st_size != size or stat.st_mtime_ns != mtime_ns:
+            return False
+
+    return True
+
+def is_build_skipped(args, config:dict):
+    # True if the stamp shows the outputs are up to date and the build can
+    # be skipped without loading FontForge
+    return args.stampfile != '' and not args.force and not args.watch and is_up_to_date(args, config)
+
+def write_stamp(args, config:dict, file_names:dict):
+    # Record the settings, the inputs and the written outputs for is_up_to_date()
+    stamp = read_stamp(args)
+    outputs = {}
+    for path in sorted(set(file_names.values())):
+        stat = os.stat(path)
+        outputs[path] = [stat.st_size, stat.st_mtime_ns]
+
+    with open(args.stampfile, 'w') as file:
+        json.dump({
+            'settings': get_stamp_settings_hash(args, config),
+            'inputs': get_stamp_inputs(list_stamp_inputs(args), stamp.get('inputs', {}) if stamp != None else {}),
+            'outputs': outputs,
+        }, file, indent=2, sort_keys=True)
+        file.write('\n')
+
+def build(args, config:dict):
+    # Build the font and all output files, returns the font and the glyph entries
+    global profiler
+
+    load_fontforge()
+
+    # The WOFF 2.0 files generated by FontForge contain timestamps, which
+    # would give them a new hash in every build
+    if args.hashnames and args.woff2file != '' and not has_woff2_compressor():
+        print('-hn or --hashnames requires fontTools with brotli for the WOFF 2.0 files, install them or set -w2 or --woff2file to \'\'')
+        sys.exit(-1)
+
+    if args.profile != '':
+        profiler = Profiler()
+
+    with timed('build'):
+
+        (svg_dir, svg_files) = list_svg_files(args.srcdir)
+
+        glyph_settings = compile_glyph_settings_or_exit(args, config, svg_files)
+
+        font = create_font(args)
+
+        entries = resolve_glyph_entries(args, svg_dir, svg_files, glyph_settings)
+
+        # The lockfile keeps the code points of the glyphs left out of the subset
+        locked_entries = entries
+
+        entries = filter_subset_entries(args, entries)
+
+        glyph_cache = open_glyph_cache(args)
+
+        if not run_preflight(args, entries, glyph_cache):
+            sys.exit(-1)
+
+        errors = assign_shards(args, entries)
+        if len(errors) > 0:
+            for error in errors:
+                print(error)
+            sys.exit(-1)
+
+        add_glyph_entries(font, entries, glyph_cache, args.jobs, args.glyphtimeout)
+
+        # Set the font's encoding to Unicode
+        font.encoding = 'unicode'
+
+        if args.debug:
+            print('font.em: %s, font.ascent=%s, font.descent=%s,' % (font.em, font.ascent, font.descent))
+            for glyph in font.glyphs():
+                bbox = get_glyph_bbox_rect(glyph)
+                print('%s, adv_width=%d, bbox=%s' % (glyph.glyphname, glyph.width, bbox))
+
+        (file_names, errors) = finish_font(args, font, entries)
+
+        # The output files are kept for inspecting the size report, but
+        # without a stamp so the next build is not skipped
+        if len(errors) > 0:
+            for error in errors:
+                print(error)
+            sys.exit(-1)
+
+        # Before the stamp, which records the lockfile as an input
+        if args.lockfile != '':
+            update_lockfile(args, locked_entries)
+
+        if args.stampfile != '':
+            write_stamp(args, config, file_names)
+
+    if args.profile != '':
+        profiler.write_report(args.profile, args.profiletop)
+        if args.profiletrace != '':
+            profiler.write_trace(args.profiletrace)
+        profiler = None
+
+    return (font, entries)
+
+def scan_sources(args):
+    # Modification times and sizes of the SVG files and the configuration file
+    sources = {}
+    paths = [entry.path for entry in os.scandir(args.srcdir) if entry.name.endswith('.svg')]
+    if args.configfile != '':
+        paths.append(args.configfile)
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        sources[path] = (stat.st_mtime_ns, stat.st_size)
+    return sources
+
+def rebuild(args, font, entries:list, old_sources:dict, new_sources:dict):
+    # Update the font in place with the added, changed and removed SVG files
+    # and regenerate the output files. Returns the new list of glyph entries
+    # or None if the sources are not valid.
+
+    try:
+        config = load_config(args)
+    except (OSError, ValueError) as e:
+        print('Failed to load configuration: %s' % (e,))
+        return None
+
+    (svg_dir, svg_files) = list_svg_files(args.srcdir)
+
+    (glyph_settings, errors) = compile_glyph_settings([svg_file[0:-len('.svg')] for svg_file in svg_files], args, config)
+    if len(errors) > 0:
+        for error in errors:
+            print(error)
+        return None
+
+    new_entries = resolve_glyph_entries(args, svg_dir, svg_files, glyph_settings)
+
+    locked_entries = new_entries
+
+    new_entries = filter_subset_entries(args, new_entries)
+
+    errors = assign_shards(args, new_entries)
+    if len(errors) > 0:
+        for error in errors:
+            print(error)
+        return None
+
+    # Give the merged duplicates their own glyphs again to compare them one by one
+    split_duplicate_glyphs(font, entries)
+
+    old_entries = {entry.glyph_name: entry for entry in entries}
+    new_names = {entry.glyph_name for entry in new_entries}
+
+    removed = [entry for entry in entries if entry.glyph_name not in new_names]
+    changed = []
+    added = []
+
+    for entry in new_entries:
+        old_entry = old_entries.get(entry.glyph_name)
+        if old_entry == None:
+            added.append(entry)
+        elif old_entry.unicode != entry.unicode \
+                or old_entry.settings.get_key() != entry.settings.get_key() \
+                or old_sources.get(entry.svg_file_path) != new_sources.get(entry.svg_file_path) \
+                or not old_entry.added:
+            changed.append(entry)
+            removed.append(old_entry)
+        else:
+            entry.glyph = old_entry.glyph
+            entry.added = True
+
+    # Only the glyphs to be imported are checked, before the font is changed
+    glyph_cache = open_glyph_cache(args)
+    if not run_preflight(args, added + changed, glyph_cache):
+        return None
+
+    for entry in removed:
+        if entry.glyph != None:
+            font.removeGlyph(entry.glyph)
+
+    if len(added) + len(changed) > 0:
+        add_glyph_entries(font, added + changed, glyph_cache, args.jobs, args.glyphtimeout)
+        font.encoding = 'unicode'
+
+    # The duplicates and the ligature rules are redone for all glyphs
+    (file_names, errors) = finish_font(args, font, new_entries)
+
+    for error in errors:
+        print(error)
+
+    if args.lockfile != '' and len(errors) == 0:
+        update_lockfile(args, locked_entries)
+
+    if args.stampfile != '' and len(errors) == 0:
+        write_stamp(args, config, file_names)
+
+    print('%d added, %d changed, %d removed' % (len(added), len(changed), len(removed) - len(changed)))
+
+    return new_entries
+
+def watch(args, config:dict):
+    # Build the font and keep it in memory, rebuilding it whenever the sources change
+
+    (font, entries) = build(args, config)
+    sources = scan_sources(args)
+
+    print('Watching %s for changes, press Ctrl+C to stop' % (args.srcdir,))
+
+    try:
+        while True:
+            time.sleep(args.watchinterval)
+
+            new_sources = scan_sources(args)
+            if new_sources == sources:
+                continue
+
+            # Wait until the files stop changing, e.g. while an editor is saving
+            while True:
+                time.sleep(args.debounce)
+                latest_sources = scan_sources(args)
+                if latest_sources == new_sources:
+                    break
+                new_sources = latest_sources
+
+            start_time = time.monotonic()
+            new_entries = rebuild(args, font, entries, sources, new_sources)
+            sources = new_sources
+            if new_entries != None:
+                entries = new_entries
+                print('Font updated in %.2f s' % (time.monotonic() - start_time,))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        font.close()
+
+def build_font(settings, config:dict = None):
+    # Build a font with all output files from settings returned by
+    # make_settings() or parse_args(). The glyph overrides are loaded
+    # from settings.config or settings.configfile unless config is passed.
+    # Returns the entries of the glyphs added to the font or None if the
+    # stamp file shows the outputs are up to date.
+    global args
+
+    args = settings
+
+    validate_args(settings)
+
+    if config == None:
+        config = load_config(settings)
+
+    if is_build_skipped(settings, config):
+        return None
+
+    (font, entries) = build(settings, config)
+
+    # Close the font
+    font.close()
+
+    for entry in entries:
+        entry.glyph = None
+
+    return [entry for entry in entries if entry.added]
+
+def build_manifest_item(settings, config:dict):
+    # Build a single font of a manifest, returns the number of glyphs, None
+    # if the outputs are up to date, or an error
+    try:
+        entries = build_font(settings, config)
+        return (len(entries) if entries != None else None, None)
+    except SystemExit as e:
+        return (None, e.code)
+    except Exception as e:
+        return (None, str(e))
+
+def build_manifest(settings, manifest_file:str):
+    # Build all fonts listed in the manifest file in this process or, with
+    # --manifestjobs, in a pool of processes sharing the loaded modules and
+    # the glyph cache
+
+    with open(manifest_file, 'r') as file:
+        items = json.load(file)
+
+    if not isinstance(items, list):
+        print('manifest %s must contain a list of fonts' % (manifest_file,))
+        sys.exit(-1)
+
+    fonts = []
+    errors = []
+    for (index, item) in enumerate(items):
+        if not isinstance(item, dict):
+            errors.append('manifest item %d: not an object' % (index,))
+            continue
+        font_settings = copy.copy(settings)
+        font_settings.manifest = ''
+        font_settings.watch = False
+        font_config = None
+        for (name, value) in item.items():
+            if name == 'config' and isinstance(value, dict):
+                font_config = value
+            elif name in ('manifest', 'manifestjobs', 'watch') or not hasattr(font_settings, name):
+                errors.append('manifest item %d: unknown setting %s' % (index, name))
+            else:
+                setattr(font_settings, name, value)
+        fonts.append((font_settings, font_config))
+
+    if len(errors) > 0:
+        for error in errors:
+            print(error)
+        sys.exit(-1)
+
+    if settings.manifestjobs > 1:
+        load_fontforge() # load once for all forked processes
+        with concurrent.futures.ProcessPoolExecutor(max_workers=settings.manifestjobs, mp_context=get_mp_context()) as executor:
+            results = list(executor.map(build_manifest_item, [font[0] for font in fonts], [font[1] for font in fonts]))
+    else:
+        results = [build_manifest_item(font_settings, font_config) for (font_settings, font_config) in fonts]
+
+    failed = 0
+    for ((font_settings, _), (glyph_count, error)) in zip(fonts, results):
+        name = font_settings.fontfamily
+        if error != None:
+            print('%s: failed: %s' % (name, error))
+            failed += 1
+        elif glyph_count == None:
+            print('%s: up to date' % (name,))
+        else:
+            print('%s: %d glyphs' % (name, glyph_count))
+
+    if failed > 0:
+        sys.exit(-1)
+
+def main():
+    global args
+
+    args = parse_args()
+
+    if args.manifest != '':
+        build_manifest(args, args.manifest)
+        return
+
+    if args.watch:
+        validate_args(args)
+        watch(args, load_config(args))
+        return
+
+    if build_font(args) == None:
+        print('Outputs are up to date')
+
+if __name__ == '__main__':
+    main()